@@ -0,0 +1,7 @@
+"""Нагрузочные прогоны Yatube.
+
+data генерирует воспроизводимую базу нужного масштаба, runner гоняет все
+адреса posts.urls под нагрузкой, report сводит задержки, запросы к базе
+и память в JSON и сравнивает с базовым прогоном. Запускается командой
+benchmark.
+"""
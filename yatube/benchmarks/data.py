@@ -0,0 +1,285 @@
+"""Воспроизводимые данные для бенчмарков и разработки.
+
+generate заполняет пустую базу пользователями, группами, постами с
+картинками, комментариями и подписками. Популярность авторов и постов
+распределена по закону Ципфа: немногие авторы пишут большую часть постов
+и собирают большую часть подписчиков, как в живой соцсети. Случайность
+задаётся seed, поэтому одинаковые параметры дают одинаковую базу.
+
+Faker вызывается только для небольших пулов имён и предложений, из
+которых собираются тексты: на миллионе постов вызов на каждый пост
+занимал бы больше времени, чем вставка. Строки вставляются кортежами
+через posts.importer.insert_rows, мимо сигналов и экземпляров моделей,
+а счётчики, ссылки на картинки и поисковый индекс считаются здесь же.
+Картинки берутся из небольшого пула файлов (images=0 — без картинок).
+Ленты подписок материализуются только с timelines=True; без этого посты
+подмешиваются в ленту при чтении, как у авторов с большим числом
+подписчиков.
+"""
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from faker import Faker
+from mixer.backend.django import mixer
+from PIL import Image, ImageDraw
+
+from core.sqlite import deferred_indexes
+from posts import search, timeline
+from posts.importer import insert_rows
+from posts.models import (
+    Comment, Follow, Group, ImageBlob, Post, User, UserStats
+)
+
+SCALES = {
+    'tiny': {'users': 50, 'groups': 5, 'posts': 500, 'comments': 1000},
+    'small': {'users': 1000, 'groups': 20, 'posts': 20000, 'comments': 40000},
+    'medium': {
+        'users': 10000, 'groups': 50, 'posts': 200000, 'comments': 400000,
+    },
+    'large': {
+        'users': 50000, 'groups': 100, 'posts': 1000000,
+        'comments': 2000000,
+    },
+}
+ZIPF_EXPONENT = 1.1
+FOLLOWS_SHAPE = 1.5
+FOLLOWS_SCALE = 7
+GROUP_SHARE = 0.6
+IMAGE_SHARE = 0.1
+IMAGES = 20
+IMAGE_SIZE = (1280, 720)
+NAMES = 500
+SENTENCES = 5000
+TEXTS = 20000
+POST_SENTENCES = (1, 8)
+BATCH_SIZE = 5000
+PASSWORD = 'benchmark'
+START = datetime(2022, 1, 1, tzinfo=timezone.utc)
+DATE_STEP = timedelta(minutes=1)
+# Кратен DATE_STEP.
+POST_INTERVAL = timedelta(minutes=1)
+COMMENT_DELAY_STEPS = 60 * 24
+
+
+def _zipf_weights(count):
+    return list(accumulate(1 / rank ** ZIPF_EXPONENT
+                           for rank in range(1, count + 1)))
+
+
+def _batches(rows, model, columns, **kwargs):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        insert_rows(model, columns, batch, **kwargs)
+
+
+def _dates(count, step):
+    """Даты START + i * step в виде для базы.
+
+    Django хранит даты в UTC без пояса, поэтому наивная дата переводится
+    в строку без пересчёта; это в разы быстрее, чем для даты с поясом.
+    """
+    adapt = connection.ops.adapt_datetimefield_value
+    start = START.replace(tzinfo=None)
+    return [adapt(start + index * step) for index in range(count)]
+
+
+def _images(rng, storage, count):
+    names = []
+    for number in range(count):
+        image = Image.new('RGB', IMAGE_SIZE, tuple(
+            rng.randrange(256) for _ in range(3)
+        ))
+        draw = ImageDraw.Draw(image)
+        for _ in range(10):
+            box = sorted(rng.sample(range(IMAGE_SIZE[0]), 2)) + sorted(
+                rng.sample(range(IMAGE_SIZE[1]), 2)
+            )
+            draw.rectangle(
+                (box[0], box[2], box[1], box[3]),
+                fill=tuple(rng.randrange(256) for _ in range(3))
+            )
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        names.append(storage.save(
+            f'posts/benchmark{number}.jpg', ContentFile(buffer.getvalue())
+        ))
+    return names
+
+
+def _follows(rng, user_ids, weights):
+    """Подписки со степенным распределением, к популярным авторам чаще."""
+    for user_id in user_ids:
+        count = min(
+            len(user_ids) - 1,
+            int(rng.paretovariate(FOLLOWS_SHAPE) * FOLLOWS_SCALE)
+        )
+        authors = set(rng.choices(user_ids, cum_weights=weights, k=count))
+        authors.discard(user_id)
+        for author_id in sorted(authors):
+            yield user_id, author_id
+
+
+def generate(users, groups, posts, comments, seed=0, images=IMAGES,
+             timelines=True, log=None):
+    """Заполняет пустую базу и возвращает число созданных строк."""
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    mixer.faker.seed_instance(seed)
+    first_names = [fake.first_name() for _ in range(NAMES)]
+    last_names = [fake.last_name() for _ in range(NAMES)]
+    sentences = [fake.sentence() for _ in range(SENTENCES)]
+
+    log('Группы')
+    group_ids = [group.pk for group in mixer.cycle(groups).blend(
+        Group,
+        title=(fake.catch_phrase() for _ in range(groups)),
+        slug=mixer.sequence('group-{0}'),
+        description=(fake.paragraph() for _ in range(groups)),
+    )]
+
+    log('Пользователи')
+    last_user = User.objects.aggregate(Max('pk'))['pk__max'] or 0
+    password = make_password(PASSWORD)
+    _batches((
+        (f'user{number}', rng.choice(first_names), rng.choice(last_names),
+         password)
+        for number in range(users)
+    ), User, ('username', 'first_name', 'last_name', 'password'))
+    user_ids = list(User.objects.filter(pk__gt=last_user).order_by(
+        'pk'
+    ).values_list('pk', flat=True))
+    weights = _zipf_weights(len(user_ids))
+
+    image_names = []
+    if images:
+        log('Картинки')
+        storage = Post._meta.get_field('image').storage
+        image_names = _images(rng, storage, images)
+
+    log('Посты')
+    # Сначала решаем, кто что пишет и комментирует: счётчики известны
+    # заранее и попадают в строки при вставке. Случайные поля строк
+    # выбираются пачками: rng.choices на миллион значений в разы
+    # быстрее миллиона вызовов rng.choice.
+    authors = rng.choices(user_ids, cum_weights=weights, k=posts)
+    post_weights = _zipf_weights(posts)
+    # По порядку постов: индекс комментариев по посту растёт подряд.
+    commented = sorted(rng.choices(
+        range(posts - 1, -1, -1), cum_weights=post_weights, k=comments
+    ))
+    comments_count = Counter(commented)
+    texts = [
+        ' '.join(rng.choices(sentences, k=rng.randint(*POST_SENTENCES)))
+        for _ in range(TEXTS)
+    ]
+    post_groups = rng.choices(
+        [None, *group_ids],
+        [1 - GROUP_SHARE, *[GROUP_SHARE / len(group_ids)] * len(group_ids)],
+        k=posts,
+    ) if group_ids else [None] * posts
+    post_images = rng.choices(
+        [None, *image_names],
+        [1 - IMAGE_SHARE,
+         *[IMAGE_SHARE / len(image_names)] * len(image_names)],
+        k=posts,
+    ) if image_names else [None] * posts
+    image_refs = Counter(post_images)
+    del image_refs[None]
+    # Посты идут через POST_INTERVAL, комментарии — в течение суток
+    # после поста; все даты берутся из одной таблицы с шагом DATE_STEP.
+    step = POST_INTERVAL // DATE_STEP
+    dates = _dates(posts * step + COMMENT_DELAY_STEPS + 1, DATE_STEP)
+
+    def post_rows():
+        return zip(
+            rng.choices(texts, k=posts),
+            authors,
+            post_groups,
+            post_images,
+            dates[::step],
+            (comments_count[index] for index in range(posts)),
+        )
+
+    def comment_rows(first_post):
+        delays = rng.choices(range(1, COMMENT_DELAY_STEPS + 1), k=comments)
+        return zip(
+            (first_post + index for index in commented),
+            rng.choices(user_ids, k=comments),
+            rng.choices(sentences, k=comments),
+            (dates[index * step + delay]
+             for index, delay in zip(commented, delays)),
+        )
+
+    last_post = Post.objects.aggregate(Max('pk'))['pk__max'] or 0
+    # id в строках берутся из только что вставленных таблиц, поэтому
+    # проверка внешних ключей на каждую строку снята: на комментариях и
+    # подписках она стоила почти половину вставки. Выключается она только
+    # вне транзакции.
+    tables = (
+        Post._meta.db_table, Comment._meta.db_table, Follow._meta.db_table
+    )
+    with search.deferred(), connection.constraint_checks_disabled(), \
+            transaction.atomic(), deferred_indexes(*tables):
+        _batches(post_rows(), Post, (
+            'text', 'author_id', 'group_id', 'image', 'pub_date',
+            'comments_count',
+        ))
+        # Одна вставка подряд даёт постам идущие подряд id.
+        first_post = Post.objects.filter(
+            pk__gt=last_post
+        ).aggregate(Min('pk'))['pk__min']
+        ImageBlob.objects.bulk_create([
+            ImageBlob(name=name, refs=refs)
+            for name, refs in image_refs.items()
+        ])
+
+        log('Комментарии')
+        _batches(
+            comment_rows(first_post), Comment,
+            ('post_id', 'author_id', 'text', 'created'),
+        )
+
+        log('Подписки')
+        followers = Counter()
+        following = Counter()
+
+        def follow_rows():
+            for user_id, author_id in _follows(rng, user_ids, weights):
+                followers[author_id] += 1
+                following[user_id] += 1
+                yield user_id, author_id
+
+        _batches(follow_rows(), Follow, ('user_id', 'author_id'))
+        posts_count = Counter(authors)
+        _batches((
+            (user_id, posts_count[user_id], followers[user_id],
+             following[user_id])
+            for user_id in user_ids
+        ), UserStats, (
+            'user_id', 'posts_count', 'followers_count', 'following_count',
+        ), ignore_conflicts=True)
+        log('Поисковый индекс')
+
+    if timelines:
+        log('Ленты подписок')
+        timeline.rebuild()
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': posts,
+        'comments': comments,
+        'follows': sum(following.values()),
+        'images': sum(image_refs.values()),
+    }
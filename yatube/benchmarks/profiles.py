@@ -0,0 +1,70 @@
+"""Сравнение профилей настроек: запуск процесса и обработка запросов.
+
+Каждый профиль (SETTINGS_PROFILE) меряется в отдельном процессе
+`python -m benchmarks.profiles`: время django.setup() и создания
+WSGI-приложения, первый запрос (шаблоны ещё не разобраны, соединения
+нет) и задержки последующих запросов ко всем адресам posts. Для
+production статика предварительно собирается collectstatic во временный
+STATIC_ROOT.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('development', 'production')
+
+
+def _child(rounds):
+    started = time.perf_counter()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    from django.core.wsgi import get_wsgi_application
+    get_wsgi_application()
+    startup = time.perf_counter() - started
+
+    from benchmarks import report, runner
+    pages = runner.targets()
+    driver = runner.ClientDriver()
+    samples = {name: [] for name, _, _ in pages}
+    name, url, user = pages[0]
+    started = time.perf_counter()
+    driver.get(user, url)
+    first = time.perf_counter() - started
+    for _ in range(rounds):
+        for name, url, user in pages:
+            started = time.perf_counter()
+            status, queries = driver.get(user, url)
+            samples[name].append(
+                (time.perf_counter() - started, queries, status)
+            )
+    driver.close()
+    summary = report.summarize(samples)
+    summary['startup_ms'] = round(startup * 1000, 2)
+    summary['first_request_ms'] = round(first * 1000, 2)
+    json.dump(summary, sys.stdout)
+
+
+def measure(profile, rounds=10):
+    """Сводка прогона профиля в отдельном процессе."""
+    with tempfile.TemporaryDirectory() as static_root:
+        env = dict(
+            os.environ, SETTINGS_PROFILE=profile, STATIC_ROOT=static_root
+        )
+        if profile == 'production':
+            subprocess.run(
+                [sys.executable, 'manage.py', 'collectstatic', '--noinput',
+                 '--verbosity', '0'],
+                cwd=BASE_DIR, env=env, check=True,
+            )
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.profiles', str(rounds)],
+            cwd=BASE_DIR, env=env, check=True, stdout=subprocess.PIPE,
+        )
+    return json.loads(result.stdout)
+
+
+if __name__ == '__main__':
+    _child(int(sys.argv[1]))
@@ -0,0 +1,100 @@
+"""Сводка замеров и сравнение с сохранённым базовым прогоном."""
+import json
+import platform
+import resource
+import sqlite3
+import sys
+
+import django
+
+PERCENTILES = (50, 95, 99)
+ERROR_STATUSES = range(500, 600)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу из отсортированного списка."""
+    if not values:
+        return None
+    rank = max(0, -(-len(values) * percent // 100) - 1)
+    return values[min(rank, len(values) - 1)]
+
+
+def peak_rss_mb():
+    # В Linux ru_maxrss в килобайтах.
+    return round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+
+
+def summarize(samples, **meta):
+    views = {}
+    for name, measurements in samples.items():
+        durations = sorted(duration for duration, _, _ in measurements)
+        queries = [count for _, count, _ in measurements if count is not None]
+        errors = sum(
+            1 for _, _, status in measurements
+            if not isinstance(status, int) or status in ERROR_STATUSES
+        )
+        views[name] = {
+            'requests': len(measurements),
+            'errors': errors,
+            **{
+                f'p{percent}_ms': round(
+                    percentile(durations, percent) * 1000, 2
+                ) if durations else None
+                for percent in PERCENTILES
+            },
+            'queries': max(queries) if queries else None,
+        }
+    return {
+        'meta': {
+            **meta,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': sys.platform,
+        },
+        'rss_mb': peak_rss_mb(),
+        'views': views,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Регрессии против базового прогона: список строк для отчёта.
+
+    Медленнее считается p95 выше базового больше чем в 1 + tolerance раз;
+    рост числа запросов к базе и ошибки — регрессия всегда.
+    """
+    regressions = []
+    for name, view in current['views'].items():
+        base = baseline['views'].get(name)
+        if base is None:
+            continue
+        if view['errors'] > base['errors']:
+            regressions.append(f'{name}: ошибок {view["errors"]}')
+        if (
+            view['queries'] is not None and base['queries'] is not None
+            and view['queries'] > base['queries']
+        ):
+            regressions.append(
+                f'{name}: запросов {base["queries"]} -> {view["queries"]}'
+            )
+        if (
+            view['p95_ms'] is not None and base['p95_ms']
+            and view['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+        ):
+            regressions.append(
+                f'{name}: p95 {base["p95_ms"]} -> {view["p95_ms"]} мс'
+            )
+    return regressions
+
+
+def load(path):
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)
+
+
+def save(path, summary):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(summary, output, ensure_ascii=False, indent=2)
+        output.write('\n')
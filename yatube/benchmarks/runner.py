@@ -0,0 +1,193 @@
+"""Прогон всех адресов posts.urls под нагрузкой.
+
+targets выбирает по данным в базе адреса для каждого представления из
+posts.urls: самую популярную группу, автора, пост с комментариями и
+читателя с подписками. run гоняет их в несколько потоков либо через
+тестовый клиент Django в этом же процессе ('client'), либо по HTTP через
+локальный WSGI-сервер ('wsgi'). Число запросов к базе берётся из
+заголовка Server-Timing (core.telemetry).
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core.queries import named_views
+from posts.models import Follow, Group, Post, User
+
+DB_QUERIES = re.compile(r'\bdb;dur=[\d.]+;desc="(\d+)"')
+
+
+def targets():
+    """Список (представление, адрес, пользователь или None)."""
+    group = Group.objects.annotate(total=Count('posts')).order_by(
+        '-total'
+    ).first()
+    author = User.objects.order_by('-stats__followers_count').first()
+    reader = User.objects.order_by('-stats__following_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    word = post.text.split()[0].strip('.,')
+    post_args = [post.pk]
+    pages = [
+        ('posts:index', [], {}),
+        ('posts:group_posts', [group.slug], {}),
+        ('posts:profile', [author.username], {}),
+        ('posts:index_rss', [], {}),
+        ('posts:index_atom', [], {}),
+        ('posts:group_rss', [group.slug], {}),
+        ('posts:group_atom', [group.slug], {}),
+        ('posts:profile_rss', [author.username], {}),
+        ('posts:profile_atom', [author.username], {}),
+        ('posts:post_detail', post_args, {}),
+        ('posts:post_comments', post_args, {}),
+        ('posts:search', [], {'q': word}),
+        ('posts:post_create', [], {}),
+        ('posts:post_edit', post_args, {}),
+        ('posts:add_comment', post_args, {}),
+        ('posts:follow_index', [], {}),
+        # Подписка и отписка идут парой, чтобы данные не менялись.
+        ('posts:profile_follow', [author.username], {}),
+        ('posts:profile_unfollow', [author.username], {}),
+    ]
+    missing = named_views('posts') - {name for name, _, _ in pages}
+    if missing:
+        raise LookupError(f'Нет адресов для {", ".join(sorted(missing))}')
+    result = []
+    for name, args, query in pages:
+        url = reverse(name, args=args)
+        if query:
+            url += '?' + urlencode(query)
+        result.append((name, url, None))
+        result.append((name, url, reader))
+    if not Follow.objects.filter(user=reader).exists():
+        raise LookupError('Нет читателя с подписками')
+    return result
+
+
+def _queries(response_headers):
+    """Запросы к базе из Server-Timing; нет метрики db — запросов не было."""
+    header = response_headers.get('Server-Timing')
+    if header is None:
+        return None
+    match = DB_QUERIES.search(header)
+    return int(match.group(1)) if match else 0
+
+
+class ClientDriver:
+    """Тестовый клиент Django: без сети, в этом процессе."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def session(self, user):
+        clients = self.local.__dict__.setdefault('clients', {})
+        if user not in clients:
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            clients[user] = client
+        return clients[user]
+
+    def get(self, user, url):
+        response = self.session(user).get(url)
+        return response.status_code, _queries(response)
+
+    def close(self):
+        connection.close()
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class WSGIDriver:
+    """Локальный WSGI-сервер в потоке и запросы к нему по HTTP."""
+
+    def __init__(self):
+        self.server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(),
+            server_class=_ThreadingServer, handler_class=_QuietHandler
+        )
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+        self.cookies = {None: ''}
+        self.lock = threading.Lock()
+
+    def cookie(self, user):
+        with self.lock:
+            if user not in self.cookies:
+                client = Client()
+                client.force_login(user)
+                self.cookies[user] = (
+                    f'sessionid={client.cookies["sessionid"].value}'
+                )
+            return self.cookies[user]
+
+    def get(self, user, url):
+        # wsgiref отвечает по HTTP/1.0: соединение на каждый запрос.
+        http = HTTPConnection('127.0.0.1', self.server.server_port)
+        try:
+            http.request('GET', url, headers={'Cookie': self.cookie(user)})
+            response = http.getresponse()
+            response.read()
+            return response.status, _queries(response.headers)
+        finally:
+            http.close()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+DRIVERS = {'client': ClientDriver, 'wsgi': WSGIDriver}
+
+
+def run(mode='client', concurrency=4, rounds=20, warmup=1):
+    """Гоняет адреса rounds раз и возвращает замеры по представлениям.
+
+    Замер — (секунды, запросов к базе, код ответа или имя исключения).
+    """
+    pages = targets()
+    driver = DRIVERS[mode]()
+    samples = {name: [] for name, _, _ in pages}
+
+    def one_round(record):
+        for name, url, user in pages:
+            started = time.perf_counter()
+            try:
+                status, queries = driver.get(user, url)
+            except Exception as error:
+                status, queries = type(error).__name__, None
+            if record:
+                samples[name].append(
+                    (time.perf_counter() - started, queries, status)
+                )
+
+    try:
+        for _ in range(warmup):
+            one_round(record=False)
+        with ThreadPoolExecutor(concurrency) as pool:
+            for future in [
+                pool.submit(one_round, True) for _ in range(rounds)
+            ]:
+                future.result()
+    finally:
+        driver.close()
+    return samples
@@ -0,0 +1,168 @@
+"""Кеш в файле SQLite, общий для всех процессов на одной машине.
+
+Не требует внешнего сервиса, а incr выполняется в одной транзакции,
+поэтому версии лент из posts.cache увеличиваются атомарно даже при
+нескольких воркерах gunicorn.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        pid, connection = getattr(self._local, 'connection', (None, None))
+        if pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _fetch(self, connection, key):
+        return connection.execute(
+            f'SELECT value FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+            (key, time.time())
+        ).fetchone()
+
+    def _store(self, connection, key, value, timeout):
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (
+                key,
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout)
+            )
+        )
+        self._cull(connection)
+
+    def _cull(self, connection):
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY expires IS NULL, expires LIMIT ?)',
+            (count // self._cull_frequency,)
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            if self._fetch(connection, key) is not None:
+                return False
+            self._store(connection, key, value, timeout)
+        return True
+
+    def get(self, key, default=None, version=None):
+        row = self._fetch(self._connection(), self._key(key, version))
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache '
+            f'WHERE key IN ({placeholders}) AND {NOT_EXPIRED}',
+            (*keys, time.time())
+        )
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            self._store(connection, key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {NOT_EXPIRED}',
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version),
+                time.time()
+            )
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        cursor = self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        return self._fetch(
+            self._connection(), self._key(key, version)
+        ) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            row = self._fetch(connection, key)
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+        return value
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь процесс: запрос его не закрывает.
+        pass
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик из DB_REPLICAS.'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не заданы: укажите DB_REPLICAS')
+        replicas.sync()
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплик обновлено: {len(settings.DATABASE_REPLICAS)}'
+        ))
@@ -0,0 +1,157 @@
+"""Бюджет SQL-запросов на представление.
+
+QueryBudgetMiddleware считает запросы и время в базе за каждый запрос к
+сайту и сравнивает число запросов с бюджетом представления из
+QUERY_BUDGETS (по имени вида 'posts:index', иначе QUERY_BUDGET_DEFAULT).
+Превышение пишется в лог 'core.queries' вместе с повторяющимися
+запросами и стеками, откуда они пришли, а в строгом режиме
+(QUERY_BUDGET_STRICT, включает декоратор query_budget) роняет запрос
+исключением QueryBudgetExceeded — так регрессия вида N+1 валит тесты.
+
+Вне DEBUG и строгого режима middleware ничего не записывает.
+
+named_views перечисляет представления пространства имён из urls: по
+нему тесты бюджетов и прогон бенчмарков проверяют, что не пропустили ни
+одного.
+"""
+import logging
+import os
+import time
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+STACK_DEPTH = 5
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _own_frames():
+    """Кадры стека из кода проекта, без библиотек и самого счётчика."""
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: запоминает запросы, время и стеки."""
+
+    def __init__(self, stacks=True):
+        self.stacks = stacks
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((
+                sql,
+                time.perf_counter() - started,
+                _own_frames() if self.stacks else None,
+            ))
+
+    def record(self):
+        """Контекст, в котором записываются запросы всех баз."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def duplicates(self):
+        """Запросы, выполненные больше одного раза: (sql, раз, стек)."""
+        seen = defaultdict(list)
+        for sql, _, stack in self.queries:
+            seen[sql].append(stack)
+        return [
+            (sql, len(stacks), stacks[0])
+            for sql, stacks in seen.items() if len(stacks) > 1
+        ]
+
+    def report(self):
+        lines = []
+        for sql, times, stack in self.duplicates():
+            lines.append(f'{times}× {sql}')
+            for frame in stack or []:
+                lines.append(
+                    f'    {os.path.relpath(frame.filename, settings.BASE_DIR)}'
+                    f':{frame.lineno} in {frame.name}'
+                )
+        return '\n'.join(lines)
+
+
+def named_views(namespace):
+    """Имена всех представлений пространства имён из urls."""
+    _, resolver = get_resolver().namespace_dict[namespace]
+    return {
+        f'{namespace}:{name}'
+        for name in resolver.reverse_dict if isinstance(name, str)
+    }
+
+
+def budget_for(view_name):
+    return settings.QUERY_BUDGETS.get(
+        view_name, settings.QUERY_BUDGET_DEFAULT
+    )
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (settings.DEBUG or settings.QUERY_BUDGET_STRICT):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        budget = budget_for(match.view_name)
+        if recorder.count <= budget:
+            return response
+        message = (
+            f'{match.view_name}: {recorder.count} запросов при бюджете '
+            f'{budget}, {recorder.duration * 1000:.1f} мс в базе'
+        )
+        duplicates = recorder.report()
+        if duplicates:
+            message += f'\nПовторяющиеся запросы:\n{duplicates}'
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        return response
+
+
+def query_budget(budgets=None):
+    """Декоратор тестов: запрос сверх бюджета роняет тест.
+
+    budgets дополняет QUERY_BUDGETS, например {'posts:index': 3}.
+    Подходит и для метода, и для класса тестов, как override_settings.
+    """
+    return override_settings(
+        QUERY_BUDGET_STRICT=True,
+        QUERY_BUDGETS={**settings.QUERY_BUDGETS, **(budgets or {})},
+    )
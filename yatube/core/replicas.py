@@ -0,0 +1,67 @@
+"""Реплики SQLite для локальной проверки чтения с реплик.
+
+У SQLite нет репликации, поэтому локально реплики — это копии файла
+базы: sync копирует основную базу в файлы реплик (backup API SQLite), а
+при REPLICA_REPLAY обёртка соединения default повторяет на репликах
+каждый изменяющий запрос после коммита его транзакции. Запросы из
+откаченных транзакций и точек сохранения не повторяются: их колбэки
+on_commit Django отбрасывает сам.
+
+Порядок повтора совпадает с порядком коммитов только внутри одного
+процесса, поэтому это средство проверки, а не репликация для продакшена.
+"""
+import sqlite3
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+WRITES = (
+    'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER',
+)
+
+
+def sync(replicas=None):
+    """Копирует основную базу в файлы реплик целиком."""
+    primary = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+    for alias in replicas or settings.DATABASE_REPLICAS:
+        connections[alias].close()
+        source = sqlite3.connect(primary)
+        target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+
+def _apply(sql, params, many):
+    for alias in settings.DATABASE_REPLICAS:
+        with connections[alias].cursor() as cursor:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+
+
+def replay(execute, sql, params, many, context):
+    if many:
+        params = list(params)
+    result = execute(sql, params, many, context)
+    if sql.lstrip()[:7].upper().startswith(WRITES):
+        transaction.on_commit(
+            partial(_apply, sql, params, many),
+            using=context['connection'].alias,
+        )
+    return result
+
+
+def install(sender, connection, **kwargs):
+    """Повтор записей на соединении default, по сигналу connection_created."""
+    if (
+        settings.REPLICA_REPLAY
+        and connection.alias == DEFAULT_DB_ALIAS
+        and replay not in connection.execute_wrappers
+    ):
+        # В начало списка: execute_wrapper() снимает обёртки с конца.
+        connection.execute_wrappers.insert(0, replay)
@@ -0,0 +1,103 @@
+"""Чтение лент с реплик базы.
+
+ReplicaMiddleware отправляет запросы GET и HEAD к представлениям из
+REPLICA_VIEWS на случайную реплику из DATABASE_REPLICAS: ReplicaRouter
+направляет туда чтение, запись всегда идёт в основную базу. Если запрос
+что-то записал, дальнейшее чтение в нём идёт из основной базы, а клиент
+получает cookie, с которой следующие REPLICA_STICKY_SECONDS секунд все
+его запросы читают из основной базы: реплика может ещё не догнать, а
+автор должен сразу видеть свой пост, комментарий или подписку.
+
+Вне запроса (команды, фоновые потоки) и без реплик всё идёт в default.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = ContextVar('replica_state', default=None)
+
+
+class State:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def is_sticky(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_for(request):
+    """Реплика для запроса или None, если читать из основной базы."""
+    match = request.resolver_match
+    if (
+        not settings.DATABASE_REPLICAS
+        or request.method not in SAFE_METHODS
+        or match is None
+        or match.view_name not in settings.REPLICA_VIEWS
+        or is_sticky(request)
+    ):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.wrote:
+            return DEFAULT_DB_ALIAS
+        return state.replica or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему из основной базы, а не миграциями.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = State()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(time.time() + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.get().replica = replica_for(request)
@@ -0,0 +1,92 @@
+"""SQLite под конкурентной нагрузкой.
+
+configure вешается на connection_created и выставляет каждому новому
+соединению с SQLite прагмы из SQLITE_PRAGMAS: журнал WAL (читатели не
+ждут писателя, писатель не ждёт читателей), synchronous=NORMAL, mmap и
+кеш страниц, busy_timeout.
+
+Писатель в SQLite всё равно один. write выполняет запись в отдельной
+транзакции под блокировкой процесса, чтобы потоки одного воркера не
+толкались за базу, а «database is locked» от других процессов
+переживает повторами с растущей паузой (SQLITE_WRITE_RETRIES,
+SQLITE_RETRY_DELAY).
+
+deferred_indexes снимает вторичные индексы таблиц на время массовой
+загрузки и строит их заново в конце: CREATE INDEX по готовой таблице в
+разы быстрее, чем поддерживать каждый индекс на каждой вставке.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+
+LOCKED = ('database is locked', 'database table is locked')
+
+_write_lock = threading.RLock()
+
+
+def configure(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+
+
+def is_locked(error):
+    return any(message in str(error) for message in LOCKED)
+
+
+def write(func, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Выполняет func(*args, **kwargs) в транзакции записи с повторами.
+
+    Внутри чужой транзакции повтор невозможен: блокировка ловится там,
+    где транзакция началась.
+    """
+    if connections[using].vendor != 'sqlite':
+        with transaction.atomic(using=using):
+            return func(*args, **kwargs)
+    retries = (
+        0 if connections[using].in_atomic_block
+        else settings.SQLITE_WRITE_RETRIES
+    )
+    for attempt in range(retries + 1):
+        try:
+            with _write_lock, transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        except OperationalError as error:
+            if attempt == retries or not is_locked(error):
+                raise
+        time.sleep(settings.SQLITE_RETRY_DELAY * 2 ** attempt)
+
+
+@contextmanager
+def deferred_indexes(*tables, using=DEFAULT_DB_ALIAS):
+    """Снимает неуникальные индексы tables и возвращает их на выходе.
+
+    Уникальные индексы остаются: они проверяют данные при вставке.
+    Вне SQLite ничего не делает.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+            "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%%' "
+            f"AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+            tables
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
@@ -0,0 +1,222 @@
+"""Замеры времени запроса: заголовок Server-Timing и журнал JSON lines.
+
+TelemetryMiddleware заводит на запрос счётчики (contextvar) и в конце
+отдаёт их в заголовке Server-Timing и строкой JSON в лог 'core.telemetry':
+сколько времени ушло на базу, шаблоны, кеш и миниатюры. Замеры снимают:
+
+- обёртка execute_wrapper у соединений с базой;
+- бэкенд шаблонов TimedTemplates;
+- обёртка бэкенда кеша TimedCache;
+- timed('thumbnail') в posts.thumbnails.
+
+Времена могут пересекаться: кеш миниатюр читается во время рендера.
+Вне запроса (фоновые потоки, команды) замеры ничего не стоят и никуда не
+пишутся. Раз в TELEMETRY_SUMMARY_EVERY запросов в лог добавляется
+строка с перцентилями длительности по представлениям за последние
+TELEMETRY_WINDOW запросов каждого.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 99)
+# Имена метрик в Server-Timing и полей журнала.
+METRICS = ('db', 'tpl', 'cache', 'thumbnail')
+
+_timings = ContextVar('telemetry_timings', default=None)
+
+
+class Timings:
+    __slots__ = ('durations', 'counts')
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def add(self, metric, duration):
+        self.durations[metric] += duration
+        self.counts[metric] += 1
+
+
+def measure(metric, func, *args, **kwargs):
+    """Вызывает func, прибавляя время вызова к метрике текущего запроса."""
+    timings = _timings.get()
+    if timings is None:
+        return func(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings.add(metric, time.perf_counter() - started)
+
+
+@contextmanager
+def timed(metric):
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(metric, time.perf_counter() - started)
+
+
+def _execute(execute, sql, params, many, context):
+    return measure('db', execute, sql, params, many, context)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        # В том числе .template и .origin, как у шаблонов бэкенда Django.
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        return measure('tpl', self._wrapped.render, context, request)
+
+
+class TimedTemplates(DjangoTemplates):
+    """Шаблоны Django с замером времени рендера."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedCache:
+    """Обёртка бэкенда кеша из CACHES[...]['WRAPPED_BACKEND'] с замерами."""
+
+    TIMED = (
+        'add', 'get', 'set', 'touch', 'delete', 'get_many', 'get_or_set',
+        'has_key', 'incr', 'decr', 'set_many', 'delete_many',
+    )
+
+    def __init__(self, location, params):
+        backend = import_string(params['WRAPPED_BACKEND'])
+        self.backend = backend(location, params)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.backend, name)
+        if name not in self.TIMED:
+            return attribute
+
+        def timed_call(*args, **kwargs):
+            return measure('cache', attribute, *args, **kwargs)
+        return timed_call
+
+    def __contains__(self, key):
+        return measure('cache', self.backend.__contains__, key)
+
+
+class Percentiles:
+    """Длительности последних запросов по представлениям."""
+
+    def __init__(self, window):
+        self.window = window
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def add(self, view, duration):
+        with self.lock:
+            self.samples[view].append(duration)
+            self.requests += 1
+            return self.requests
+
+    def summary(self):
+        with self.lock:
+            samples = {
+                view: sorted(durations)
+                for view, durations in self.samples.items()
+            }
+        return {
+            view: {
+                'count': len(durations),
+                **{
+                    f'p{percentile}': round(durations[min(
+                        len(durations) - 1,
+                        len(durations) * percentile // 100
+                    )] * 1000, 1)
+                    for percentile in PERCENTILES
+                },
+            }
+            for view, durations in samples.items()
+        }
+
+
+def server_timing(timings, total):
+    parts = []
+    for metric in METRICS:
+        if metric in timings.counts:
+            parts.append(
+                f'{metric};dur={timings.durations[metric] * 1000:.1f};'
+                f'desc="{timings.counts[metric]}"'
+            )
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class TelemetryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.percentiles = Percentiles(settings.TELEMETRY_WINDOW)
+
+    def __call__(self, request):
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_execute))
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        total = time.perf_counter() - started
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = server_timing(timings, total)
+        if logger.isEnabledFor(logging.INFO):
+            self.log(request, response, timings, total)
+        return response
+
+    def log(self, request, response, timings, total):
+        match = request.resolver_match
+        view = match.view_name if match else ''
+        requests = self.percentiles.add(view, total)
+        record = {
+            'time': round(time.time(), 3),
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'ms': round(total * 1000, 1),
+        }
+        for metric in METRICS:
+            if metric in timings.counts:
+                record[f'{metric}_ms'] = round(
+                    timings.durations[metric] * 1000, 1
+                )
+                record[f'{metric}_calls'] = timings.counts[metric]
+        logger.info(json.dumps(record, ensure_ascii=False))
+        if requests % settings.TELEMETRY_SUMMARY_EVERY == 0:
+            logger.info(json.dumps(
+                {'summary': self.percentiles.summary()},
+                ensure_ascii=False
+            ))
@@ -0,0 +1,410 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+
+from posts.cache import get_versions
+
+from . import routers, sqlite
+from .queries import QueryRecorder
+from .telemetry import Percentiles
+
+BUMP_SCRIPT = "from posts.cache import bump; bump('posts')"
+REPLICA_SCRIPT = """
+import json
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from posts.models import Post, User
+
+author = User.objects.create_user('author')
+Post.objects.create(author=author, text='Пост с реплики')
+client = Client()
+client.force_login(User.objects.create_user('reader'))
+result = {}
+# Второй раз — сразу после подписки, записи в основную базу.
+for phase in ('replica', 'sticky'):
+    with CaptureQueriesContext(connections['replica1']) as replica, \\
+            CaptureQueriesContext(connections['default']) as primary:
+        response = client.get('/')
+    result[phase] = {
+        'replicated': 'Пост с реплики' in response.content.decode(),
+        'replica': len(replica),
+        'primary': len(primary),
+    }
+    client.get(f'/profile/{author.username}/follow/')
+print(json.dumps(result))
+"""
+SETTINGS_SCRIPT = (
+    'import json; from django.conf import settings; print(json.dumps(['
+    'settings.DEBUG, settings.INSTALLED_APPS, settings.MIDDLEWARE, '
+    'settings.TEMPLATES[0], settings.DATABASES["default"]["CONN_MAX_AGE"], '
+    'settings.STATICFILES_STORAGE, '
+    'settings.CACHES["default"]["WRAPPED_BACKEND"]]))'
+)
+
+
+def cache_settings(backend, location):
+    return {
+        'default': {
+            'BACKEND': settings.CACHE_BACKENDS[backend][0],
+            'LOCATION': location,
+        }
+    }
+
+
+class SharedCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def bump_in_other_process(self, backend, location):
+        env = dict(
+            os.environ, CACHE_BACKEND=backend, CACHE_LOCATION=location
+        )
+        subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c', BUMP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, check=True
+        )
+
+    def test_invalidation_is_shared_between_processes(self):
+        """Сброс версии ленты в другом процессе виден в этом."""
+        locations = {
+            'sqlite': os.path.join(self.directory, 'cache.sqlite3'),
+            'file': os.path.join(self.directory, 'cache'),
+        }
+        for backend, location in locations.items():
+            with self.subTest(backend=backend):
+                with override_settings(
+                    CACHES=cache_settings(backend, location)
+                ):
+                    version, = get_versions('posts')
+                    self.bump_in_other_process(backend, location)
+                    self.assertEqual(get_versions('posts'), [version + 1])
+
+
+class SettingsProfileTest(SimpleTestCase):
+    def load(self, profile):
+        env = dict(os.environ, SETTINGS_PROFILE=profile)
+        env.pop('DEBUG', None)
+        env.pop('CACHE_BACKEND', None)
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c', SETTINGS_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, check=True,
+            stdout=subprocess.PIPE,
+        )
+        return json.loads(result.stdout)
+
+    def test_production_profile(self):
+        """В production нет отладки, шаблоны кешируются, статика с хешами."""
+        (
+            debug, apps, middleware, templates, conn_max_age, storage,
+            cache_backend,
+        ) = self.load('production')
+        self.assertFalse(debug)
+        self.assertNotIn('debug_toolbar', apps)
+        self.assertFalse(any('debug_toolbar' in name for name in middleware))
+        loader, _ = templates['OPTIONS']['loaders'][0]
+        self.assertEqual(loader, 'django.template.loaders.cached.Loader')
+        self.assertGreater(conn_max_age, 0)
+        self.assertTrue(storage.endswith('ManifestStaticFilesStorage'))
+        # Версии лент общие для всех воркеров.
+        self.assertEqual(cache_backend, 'core.cache.SQLiteCache')
+
+    def test_development_profile(self):
+        """По умолчанию отладка включена, шаблоны читаются с диска."""
+        debug, _, _, templates, conn_max_age, storage, cache_backend = (
+            self.load('development')
+        )
+        self.assertTrue(debug)
+        self.assertNotIn('loaders', templates['OPTIONS'])
+        self.assertEqual(conn_max_age, 0)
+        self.assertEqual(
+            storage, 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        )
+        self.assertTrue(cache_backend.endswith('LocMemCache'))
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(tempfile.mkdtemp(), 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2},
+    }
+})
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_set_get_delete(self):
+        """Значение сохраняется, читается и удаляется."""
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertTrue(cache.has_key('key'))
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_add_and_incr(self):
+        """add не перезаписывает ключ, incr атомарно увеличивает число."""
+        self.assertTrue(cache.add('counter', 1))
+        self.assertFalse(cache.add('counter', 10))
+        self.assertEqual(cache.incr('counter'), 2)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    def test_expired_value_is_missing(self):
+        """Просроченное значение не возвращается."""
+        cache.set('key', 'value', -1)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get_many(['key']), {})
+
+    def test_get_many(self):
+        """get_many читает несколько ключей одним запросом."""
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+
+    def test_cull(self):
+        """При переполнении старые записи вытесняются."""
+        for number in range(20):
+            cache.set(f'key{number}', number)
+        self.assertTrue(cache.has_key('key19'))
+        self.assertLess(
+            sum(cache.has_key(f'key{number}') for number in range(20)), 20
+        )
+
+
+class QueryRecorderTest(TestCase):
+    def test_duplicates_reported_with_stack(self):
+        """Повторяющийся запрос попадает в отчёт со строкой, откуда пришёл."""
+        recorder = QueryRecorder()
+        with recorder.record():
+            for pk in (1, 1, 2):
+                get_user_model().objects.filter(pk=pk).exists()
+        self.assertEqual(recorder.count, 3)
+        (sql, times, _), = recorder.duplicates()
+        self.assertEqual(times, 3)
+        self.assertIn('core/tests.py', recorder.report())
+
+
+class TelemetryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Страница сообщает время базы, шаблонов, кеша и общее."""
+        response = self.client.get(reverse('posts:index'))
+        metrics = [
+            part.split(';')[0]
+            for part in response['Server-Timing'].split(', ')
+        ]
+        self.assertEqual(metrics, ['db', 'tpl', 'cache', 'total'])
+
+    @override_settings(TELEMETRY_SUMMARY_EVERY=1)
+    def test_json_lines_log(self):
+        """Журнал получает строку JSON на запрос и строку перцентилей."""
+        with self.assertLogs('core.telemetry', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        # Строки assertLogs имеют вид 'INFO:core.telemetry:<сообщение>'.
+        record, summary = [
+            json.loads(output.split(':', 2)[2]) for output in logs.output
+        ]
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_calls'], 0)
+        self.assertEqual(summary['summary']['posts:index']['count'], 1)
+
+    def test_percentiles(self):
+        """Перцентили считаются по последним запросам представления."""
+        percentiles = Percentiles(window=100)
+        for duration in range(1, 201):
+            percentiles.add('view', duration / 1000)
+        self.assertEqual(
+            percentiles.summary()['view'],
+            {'count': 100, 'p50': 151.0, 'p90': 191.0, 'p99': 200.0}
+        )
+
+
+class SQLiteConcurrencyTest(SimpleTestCase):
+    readers = 8
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'db.sqlite3')
+        connection = self.connect()
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        connection.close()
+
+    def connect(self):
+        # Своё соединение на поток, как у воркеров сервера.
+        return DatabaseWrapper(
+            dict(connections.databases['default'], NAME=self.path),
+            alias=f'concurrency-{threading.get_ident()}',
+        )
+
+    def read_while_writing(self):
+        """Читатели в потоках, пока писатель держит транзакцию записи."""
+        writing = threading.Event()
+        done = threading.Event()
+
+        def writer():
+            connection = self.connect()
+            with connection.cursor() as cursor:
+                cursor.execute('BEGIN EXCLUSIVE')
+                cursor.execute('INSERT INTO item DEFAULT VALUES')
+                writing.set()
+                done.wait(10)
+                cursor.execute('COMMIT')
+            connection.close()
+
+        def reader():
+            connection = self.connect()
+            started = time.perf_counter()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM item')
+                    return cursor.fetchone()[0], time.perf_counter() - started
+            except OperationalError as error:
+                return error
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        writing.wait(10)
+        try:
+            with ThreadPoolExecutor(self.readers) as pool:
+                return [
+                    future.result() for future in
+                    [pool.submit(reader) for _ in range(self.readers)]
+                ]
+        finally:
+            done.set()
+            thread.join()
+
+    def test_readers_not_blocked_by_writer(self):
+        """В WAL читатели сразу видят данные до незавершённой записи."""
+        for result in self.read_while_writing():
+            self.assertNotIsInstance(result, OperationalError)
+            count, seconds = result
+            self.assertEqual(count, 0)
+            self.assertLess(seconds, 1)
+
+    @override_settings(SQLITE_PRAGMAS={
+        'busy_timeout': 100, 'journal_mode': 'DELETE'
+    })
+    def test_readers_blocked_without_wal(self):
+        """С журналом отката по умолчанию писатель блокирует читателей."""
+        for result in self.read_while_writing():
+            self.assertIsInstance(result, OperationalError)
+            self.assertTrue(sqlite.is_locked(result))
+
+
+@override_settings(SQLITE_RETRY_DELAY=0)
+class SQLiteWriteTest(TransactionTestCase):
+    def locked_twice(self):
+        return mock.Mock(side_effect=[
+            OperationalError('database is locked'),
+            OperationalError('database is locked'),
+            'saved',
+        ])
+
+    def test_write_retries_locked_database(self):
+        """Запись повторяется, пока база занята другим писателем."""
+        func = self.locked_twice()
+        self.assertEqual(sqlite.write(func, 1, key='value'), 'saved')
+        self.assertEqual(func.call_count, 3)
+        func.assert_called_with(1, key='value')
+
+    def test_no_retry_inside_transaction(self):
+        """Внутри внешней транзакции ошибка уходит наверх сразу."""
+        func = self.locked_twice()
+        with self.assertRaises(OperationalError):
+            with transaction.atomic():
+                sqlite.write(func)
+        self.assertEqual(func.call_count, 1)
+
+    def test_pragmas_applied(self):
+        """Новое соединение получает прагмы из настроек."""
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+
+
+class ReplicaTest(SimpleTestCase):
+    def test_feed_views_read_from_replica(self):
+        """Ленты читаются с реплики, остальное и запись — из основной базы."""
+        factory = RequestFactory()
+        for name, args, method, replica in (
+            ('posts:index', [], 'get', True),
+            ('posts:post_detail', [1], 'head', True),
+            ('posts:post_detail', [1], 'post', False),
+            ('posts:follow_index', [], 'get', False),
+        ):
+            with self.subTest(name=name, method=method):
+                url = reverse(name, args=args)
+                request = getattr(factory, method)(url)
+                request.resolver_match = resolve(url)
+                with override_settings(DATABASE_REPLICAS=['replica1']):
+                    self.assertEqual(
+                        routers.replica_for(request),
+                        'replica1' if replica else None
+                    )
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_sticky_cookie_keeps_primary(self):
+        """После записи клиент какое-то время читает из основной базы."""
+        request = RequestFactory().get(reverse('posts:index'))
+        request.resolver_match = resolve(reverse('posts:index'))
+        request.COOKIES[routers.STICKY_COOKIE] = str(time.time() + 5)
+        self.assertIsNone(routers.replica_for(request))
+        request.COOKIES[routers.STICKY_COOKIE] = str(time.time() - 1)
+        self.assertEqual(routers.replica_for(request), 'replica1')
+
+    def test_two_sqlite_files_with_replay(self):
+        """Две базы SQLite: запись повторяется на реплике, чтение с неё."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        env = dict(
+            os.environ,
+            DB_NAME=os.path.join(directory, 'primary.sqlite3'),
+            DB_REPLICAS=os.path.join(directory, 'replica.sqlite3'),
+            REPLICA_REPLAY='1',
+            MEDIA_ROOT=os.path.join(directory, 'media'),
+        )
+        for command in (['migrate', '-v', '0'], ['sync_replicas']):
+            subprocess.run(
+                [sys.executable, 'manage.py', *command],
+                cwd=settings.BASE_DIR, env=env, check=True,
+                stdout=subprocess.DEVNULL,
+            )
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c', REPLICA_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, check=True,
+            stdout=subprocess.PIPE,
+        )
+        result = json.loads(result.stdout)
+        self.assertTrue(result['replica']['replicated'])
+        self.assertGreater(result['replica']['replica'], 0)
+        self.assertEqual(result['sticky']['replica'], 0)
+        self.assertGreater(result['sticky']['primary'], 0)
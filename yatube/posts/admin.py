@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Post, Group, Comment, Follow
+from . import search
+
+from .models import Post, Group, Comment, Follow, ImageBlob, UserStats
 
 
 @admin.register(Post)
@@ -11,6 +13,12 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице — полнотекстовый индекс.
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -28,3 +36,17 @@ class CommentAdmin(admin.ModelAdmin):
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
     empty_value_display = '-пусто-'
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'user', 'posts_count', 'followers_count', 'following_count'
+    )
+    readonly_fields = list_display
+
+
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'refs')
+    readonly_fields = list_display
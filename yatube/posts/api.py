@@ -0,0 +1,266 @@
+"""JSON API v1: ленты, посты, комментарии и подписки.
+
+Повторяет страницы index, group_posts, profile, post_detail и действия
+add_comment, profile_follow/profile_unfollow, но отдаёт компактный JSON.
+Строки выбираются через values() без сборки экземпляров моделей, а
+параметр ?fields=id,text оставляет в ответе (и в SELECT) только нужные
+поля. Ленты листаются курсором ?after= из поля next, как и страницы
+сайта. ETag и Last-Modified те же, что у страниц (conditional_feed).
+
+Авторизация сессионная, запись требует CSRF-токен в X-CSRFToken.
+Потоковая выгрузка таблиц (export) доступна только персоналу.
+"""
+import json
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+
+from core.sqlite import write
+
+from . import export as exports
+from .cache import conditional_feed
+from .forms import CommentForm
+from .models import Comment, Follow, Group, Post
+from .paginator import decode_cursor, encode_key, seek
+from .views import (
+    NUMBER_OF_COMMENTS, NUMBER_OF_POSTS, group_scopes, post_scopes,
+    profile_scopes
+)
+
+# Поле ответа -> поле для values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+# Ленты кешируются версиями лент, которые комментарии не сбрасывают:
+# счётчик комментариев есть только у отдельного поста.
+FEED_FIELDS = {
+    name: lookup for name, lookup in POST_FIELDS.items()
+    if name != 'comments_count'
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+AUTHOR_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def api_view(*methods):
+    """Ограничивает методы и превращает ApiError в ответ JSON."""
+    def decorator(view):
+        @require_http_methods(methods)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                return _json({'detail': error.detail}, status=error.status)
+        return wrapper
+    return decorator
+
+
+def _user(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+    return request.user
+
+
+def _fields(request, available):
+    """Поля из ?fields= или все, если параметра нет."""
+    names = [
+        name.strip() for name in request.GET.get('fields', '').split(',')
+        if name.strip()
+    ]
+    unknown = set(names) - set(available)
+    if unknown:
+        raise ApiError(400, f'Нет полей: {", ".join(sorted(unknown))}')
+    return {name: available[name] for name in names} if names else available
+
+
+def _serialize(row, fields):
+    item = {name: row[lookup] for name, lookup in fields.items()}
+    if 'image' in item:
+        item['image'] = (
+            IMAGE_STORAGE.url(item['image']) if item['image'] else None
+        )
+    return item
+
+
+def _page(request, queryset, fields, per_page, date_field='pub_date',
+          ascending=False):
+    """Страница по курсору ?after= и курсор следующей."""
+    rows = list(seek(
+        queryset, decode_cursor(request.GET.get('after')), ascending,
+        date_field
+    ).values(*{*fields.values(), 'id', date_field})[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_key(rows[-1][date_field], rows[-1]['id'])
+    return {
+        'results': [_serialize(row, fields) for row in rows],
+        'next': next_cursor,
+    }
+
+
+def _posts(request, queryset):
+    return _page(
+        request, queryset, _fields(request, FEED_FIELDS), NUMBER_OF_POSTS
+    )
+
+
+def _comments(request, post_id):
+    return _page(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        NUMBER_OF_COMMENTS, date_field='created', ascending=True
+    )
+
+
+@api_view('GET', 'HEAD')
+@conditional_feed(lambda request: ['posts'])
+def posts(request):
+    return _json(_posts(request, Post.objects.all()))
+
+
+@api_view('GET', 'HEAD')
+@conditional_feed(group_scopes)
+def group(request, slug):
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'slug', 'title', 'description'
+    ).first()
+    if group is None:
+        raise ApiError(404, 'Группа не найдена')
+    page = _posts(request, Post.objects.filter(group_id=group.pop('id')))
+    return _json({'group': group, **page})
+
+
+@api_view('GET', 'HEAD')
+@conditional_feed(profile_scopes)
+def profile(request, username):
+    author = User.objects.filter(username=username).values(
+        'id', *AUTHOR_FIELDS.values()
+    ).first()
+    if author is None:
+        raise ApiError(404, 'Автор не найден')
+    author_id = author['id']
+    data = {'author': _serialize(author, AUTHOR_FIELDS)}
+    if request.user.is_authenticated:
+        data['following'] = Follow.objects.filter(
+            user=request.user, author_id=author_id
+        ).exists()
+    data.update(_posts(request, Post.objects.filter(author_id=author_id)))
+    return _json(data)
+
+
+@api_view('GET', 'HEAD')
+@conditional_feed(post_scopes)
+def post(request, post_id):
+    fields = _fields(request, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(*fields.values()).first()
+    if row is None:
+        raise ApiError(404, 'Пост не найден')
+    return _json({
+        'post': _serialize(row, fields),
+        'comments': _comments(request, post_id),
+    })
+
+
+@api_view('GET', 'HEAD', 'POST')
+@conditional_feed(post_scopes)
+def comments(request, post_id):
+    """Комментарии поста по курсору; POST добавляет комментарий."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise ApiError(404, 'Пост не найден')
+    if request.method != 'POST':
+        return _json(_comments(request, post_id))
+    user = _user(request)
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            raise ApiError(400, 'Тело запроса не JSON')
+    else:
+        data = request.POST
+    form = CommentForm(data)
+    if not form.is_valid():
+        return _json({'errors': form.errors}, status=400)
+    comment = form.save(commit=False)
+    comment.author = user
+    comment.post_id = post_id
+    write(comment.save)
+    return _json({
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created,
+        'author': user.username,
+    }, status=201)
+
+
+@api_view('POST', 'DELETE')
+def follow(request, username):
+    """POST подписывает на автора, DELETE отписывает."""
+    user = _user(request)
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        raise ApiError(404, 'Автор не найден')
+    if author_id == user.pk:
+        raise ApiError(400, 'Нельзя подписаться на себя')
+    if request.method == 'DELETE':
+        write(Follow.objects.filter(user=user, author_id=author_id).delete)
+        return _json({'following': False})
+    _, created = write(
+        Follow.objects.get_or_create, user=user, author_id=author_id
+    )
+    return _json({'following': True}, status=201 if created else 200)
+
+
+@api_view('GET')
+def export(request, kind):
+    """Потоковая выгрузка набора kind: ?format=ndjson|csv&since=<ISO>."""
+    if not _user(request).is_staff:
+        raise ApiError(403, 'Выгрузка доступна только персоналу')
+    export_format = request.GET.get('format', 'ndjson')
+    try:
+        lines = exports.format_lines(export_format, kind, exports.rows(
+            kind, exports.parse_since(request.GET.get('since'))
+        ))
+    except exports.ExportError as error:
+        raise ApiError(400, str(error))
+    response = StreamingHttpResponse(
+        lines, content_type=exports.FORMATS[export_format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{export_format}"'
+    )
+    return response
@@ -0,0 +1,26 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api_v1'
+
+urlpatterns = [
+    # Общая лента
+    path('posts/', api.posts, name='posts'),
+    # Пост с первой порцией комментариев
+    path('posts/<int:post_id>/', api.post, name='post'),
+    # Комментарии: чтение по курсору и добавление
+    path(
+        'posts/<int:post_id>/comments/', api.comments, name='comments'
+    ),
+    # Группа и её лента
+    path('groups/<slug:slug>/', api.group, name='group'),
+    # Автор и его лента
+    path('profiles/<str:username>/', api.profile, name='profile'),
+    # Подписка (POST) и отписка (DELETE)
+    path(
+        'profiles/<str:username>/follow/', api.follow, name='follow'
+    ),
+    # Потоковая выгрузка для аналитики
+    path('export/<str:kind>/', api.export, name='export'),
+]
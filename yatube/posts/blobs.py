@@ -0,0 +1,77 @@
+"""Счётчики ссылок на файлы картинок.
+
+ContentAddressedStorage хранит одинаковые картинки одним файлом, поэтому
+его могут использовать несколько постов. Число ссылок на картинки и их
+адаптивные варианты хранится в ImageBlob, а файл удаляется вместе с
+миниатюрами, только когда на него не остаётся ссылок.
+
+Картинки, загруженные до хранилища по содержимому, лежат под исходными
+именами; adopt переносит их под хеш, склеивая дубли.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import F
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageBlob, Post
+
+CONTENT_NAME = re.compile(
+    r'^posts/(?:variants/)?[0-9a-f]{2}/[0-9a-f]{64}\.\w+$'
+)
+
+
+def acquire(name):
+    """Учитывает ещё одну ссылку на файл."""
+    if not name:
+        return
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name)], ignore_conflicts=True
+    )
+    ImageBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(name, storage):
+    """Снимает ссылку и удаляет файл после коммита, если она последняя."""
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name).update(refs=F('refs') - 1)
+    if ImageBlob.objects.filter(name=name, refs__lte=0).delete()[0]:
+        transaction.on_commit(lambda: _delete(name, storage))
+
+
+def _delete(name, storage):
+    # Удаляем только файлы, сохранённые хранилищем: старые имена могут
+    # указывать куда угодно. Пока шёл коммит, ту же картинку могли
+    # загрузить снова.
+    if CONTENT_NAME.match(name) and not ImageBlob.objects.filter(
+        name=name
+    ).exists():
+        delete(ImageFile(name, storage))
+
+
+def legacy_names():
+    """Картинки постов, сохранённые под исходными именами."""
+    names = Post.objects.exclude(image='').exclude(image=None).order_by(
+        'image'
+    ).values_list('image', flat=True).distinct()
+    return [name for name in names if not CONTENT_NAME.match(name)]
+
+
+def adopt(name, storage):
+    """Переносит картинку под хеш содержимого и возвращает новое имя."""
+    with storage.open(name) as content:
+        new_name = storage.save(name, content)
+    with transaction.atomic():
+        moved = Post.objects.filter(image=name).update(image=new_name)
+        ImageBlob.objects.filter(name=name).delete()
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=new_name)], ignore_conflicts=True
+        )
+        ImageBlob.objects.filter(name=new_name).update(
+            refs=F('refs') + moved
+        )
+        # Старый файл открылся через хранилище, значит, лежит внутри него.
+        transaction.on_commit(lambda: delete(ImageFile(name, storage)))
+    return new_name
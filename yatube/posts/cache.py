@@ -0,0 +1,200 @@
+"""Версионированный кеш лент с защитой от наплыва запросов.
+
+У каждой ленты есть версия в кеше: общая 'posts', 'group:<id>',
+'profile:<id>' и 'follow:<id>'. Сигналы при изменении постов и подписок
+увеличивают версию, и запись с прежней версией считается устаревшей.
+
+get_or_compute пересчитывает значение в одном воркере под коротким
+замком, остальные в это время получают устаревшее значение. Чтобы
+горячие ключи не истекали у всех разом, пересчёт иногда начинается
+раньше срока (вероятностное раннее истечение, XFetch).
+
+Те же версии дают ETag и Last-Modified страниц (conditional_feed), поэтому
+на условный запрос 304 отвечает без запроса ленты и рендера шаблонов.
+Страница, собранная из значения прежней версии, уходит без ETag и
+Last-Modified (mark_stale): иначе клиент получал бы 304 на устаревшую
+страницу до следующей смены версии.
+Версия MEDIA_SCOPE входит во все страницы: она растёт, когда готова
+миниатюра, вместо которой показывалась заглушка.
+"""
+import hashlib
+import math
+import random
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+VERSION_KEY = 'feed-version:{}'
+MODIFIED_KEY = 'feed-modified:{}'
+MEDIA_SCOPE = 'thumbnails'
+CURSOR_PARAMS = ('after', 'before', 'page')
+LOCK_TIMEOUT = 10
+STALE_TIMEOUT = 60 * 10
+POLL_INTERVAL = 0.05
+STALE_ATTR = '_feed_stale'
+EARLY_EXPIRY_BETA = 1.0
+
+
+def _initial_version():
+    # Версия после вытеснения ключа не должна совпасть с прежней.
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    """Возвращает текущие версии лент, заводя недостающие."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [
+        scope for scope, key in zip(scopes, keys) if key not in versions
+    ]
+    if missing:
+        for scope in missing:
+            cache.add(VERSION_KEY.format(scope), _initial_version(), None)
+            cache.add(MODIFIED_KEY.format(scope), time.time(), None)
+        versions.update(cache.get_many(keys))
+    return [versions.get(key, 0) for key in keys]
+
+
+def get_modified(*scopes):
+    """Время последнего изменения лент или None, если оно неизвестно."""
+    keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    modified = cache.get_many(keys)
+    if not scopes or len(modified) < len(keys):
+        return None
+    return datetime.fromtimestamp(max(modified.values()), timezone.utc)
+
+
+def bump(*scopes):
+    """Сбрасывает закешированные фрагменты указанных лент."""
+    now = time.time()
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+    cache.set_many(
+        {MODIFIED_KEY.format(scope): now for scope in scopes}, None
+    )
+
+
+def post_scopes(post, group_id=None):
+    """Ленты, в которых показывается пост."""
+    scopes = ['posts', f'profile:{post.author_id}', f'post:{post.pk}']
+    for pk in {post.group_id, group_id} - {None}:
+        scopes.append(f'group:{pk}')
+    return scopes
+
+
+def feed_key(request, feed, *scopes):
+    """Ключ и версия страницы ленты для get_or_compute.
+
+    Ключ зависит от ленты, курсора и признака авторизации, от которого
+    зависит разметка; версия складывается из версий областей ленты.
+    """
+    parts = [feed, request.user.is_authenticated]
+    parts += [request.GET.get(name, '') for name in CURSOR_PARAMS]
+    digest = hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+    version = ':'.join(map(str, get_versions(*scopes, MEDIA_SCOPE)))
+    return f'feed:{digest}', version
+
+
+def conditional_feed(scopes_func):
+    """Отвечает 304, пока не изменились ленты, из которых собрана страница.
+
+    scopes_func получает аргументы представления и возвращает области
+    страницы; ей разрешены только дешёвые запросы по индексу. ETag зависит
+    ещё от пользователя, для которого отрисована шапка и формы.
+    """
+    def scopes(request, *args, **kwargs):
+        if not hasattr(request, '_feed_scopes'):
+            request._feed_scopes = [
+                *scopes_func(request, *args, **kwargs), MEDIA_SCOPE
+            ]
+        return request._feed_scopes
+
+    def etag(request, *args, **kwargs):
+        parts = [settings.RELEASE, request.user.pk]
+        parts += get_versions(*scopes(request, *args, **kwargs))
+        return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return get_modified(*scopes(request, *args, **kwargs))
+
+    def decorator(view):
+        return stale_aware(condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view))
+
+    return decorator
+
+
+def mark_stale(request):
+    """Страница отрисована из прежней версии: без валидаторов кеша."""
+    setattr(request, STALE_ATTR, True)
+
+
+def stale_aware(view):
+    """Убирает ETag и Last-Modified с ответов, помеченных mark_stale."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if getattr(request, STALE_ATTR, False):
+            del response['ETag']
+            del response['Last-Modified']
+        return response
+    return wrapper
+
+
+def _expired(expires, delta):
+    return time.time() - delta * EARLY_EXPIRY_BETA * math.log(
+        1 - random.random()
+    ) >= expires
+
+
+def _served(entry, version, stale):
+    if entry[0] != version and stale is not None:
+        stale()
+    return entry[1]
+
+
+def get_or_compute(key, version, compute, timeout, stale=None):
+    """Возвращает значение из кеша, пересчитывая его в одном потоке.
+
+    stale вызывается, если вместо пересчёта отдано значение другой версии.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        entry_version, value, expires, delta = entry
+        if entry_version == version and not _expired(expires, delta):
+            return value
+    lock = f'{key}:lock'
+    if cache.add(lock, True, LOCK_TIMEOUT):
+        try:
+            started = time.monotonic()
+            value = compute()
+            delta = time.monotonic() - started
+            cache.set(
+                key,
+                (version, value, time.time() + timeout, delta),
+                timeout + STALE_TIMEOUT
+            )
+        finally:
+            cache.delete(lock)
+        return value
+    if entry is not None:
+        return _served(entry, version, stale)
+    # Холодный ключ уже считает другой воркер: ждём его результат.
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return _served(entry, version, stale)
+        if not cache.has_key(lock):
+            break
+    return compute()
@@ -0,0 +1,98 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным UPDATE ... SET x = x + 1 из сигналов, а
+команда recount сверяет их с реальными агрегатами и чинит расхождения.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def bump(user_id, **deltas):
+    """Сдвигает счётчики пользователя на заданные величины."""
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if UserStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        # Строки нет: пользователь удаляется каскадом, уменьшать нечего.
+        return
+    UserStats.objects.get_or_create(user_id=user_id)
+    UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def bump_comments(post_id, delta):
+    """Сдвигает счётчик комментариев поста."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def _actual(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def _repair(queryset, field, actual):
+    drifted = queryset.annotate(actual=actual).exclude(**{field: F('actual')})
+    fixed = 0
+    for pk, value in drifted.values_list('pk', 'actual').iterator():
+        queryset.filter(pk=pk).update(**{field: value})
+        fixed += 1
+    return fixed
+
+
+def recount():
+    """Пересчитывает все счётчики. Возвращает {счётчик: исправлено строк}."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing], batch_size=500
+    )
+    stats = UserStats.objects.all()
+    return {
+        'posts_count': _repair(
+            stats, 'posts_count', _actual(Post.objects, 'author')
+        ),
+        'followers_count': _repair(
+            stats, 'followers_count', _actual(Follow.objects, 'author')
+        ),
+        'following_count': _repair(
+            stats, 'following_count', _actual(Follow.objects, 'user')
+        ),
+        'comments_count': _repair(
+            Post.objects.all(), 'comments_count',
+            _actual(Comment.objects, 'post')
+        ),
+    }
+
+
+def recount_users(user_ids, batch_size=500):
+    """Пересчитывает счётчики постов и подписок только у user_ids.
+
+    Для массовой загрузки: вместо сверки по строкам каждая пачка
+    пользователей обновляется одним UPDATE с подзапросами. Возвращает
+    число пересчитанных строк.
+    """
+    user_ids = sorted(user_ids)
+    updated = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            UserStats.objects.bulk_create(
+                [UserStats(user_id=pk) for pk in batch],
+                ignore_conflicts=True
+            )
+            updated += UserStats.objects.filter(user_id__in=batch).update(
+                posts_count=_actual(Post.objects, 'author'),
+                followers_count=_actual(Follow.objects, 'author'),
+                following_count=_actual(Follow.objects, 'user'),
+            )
+    return updated
@@ -0,0 +1,188 @@
+"""Ленты RSS и Atom: весь сайт, группа по slug и автор.
+
+Читалки лент опрашивают адрес раз в несколько минут, поэтому лента
+отвечает по тем же версиям кеша, что и страницы (posts.cache): ETag и
+Last-Modified считаются по версии области без запросов к постам, и на
+условный запрос уходит 304. Если лента изменилась, тело берётся из кеша
+целиком: XML собирается один раз на версию области в get_or_compute, а
+сигналы создания, правки и удаления поста увеличивают версии 'posts',
+'group:<id>' и 'profile:<id>'. В ленте не больше NUMBER_OF_ITEMS
+последних постов.
+
+В отличие от страниц ETag не зависит от пользователя и от готовности
+миниатюр: в ленте только текст постов. Тело прежней версии, отданное во
+время чужого пересчёта, уходит без валидаторов, как и у страниц.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.syndication.views import Feed
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from . import cache
+from .models import Group, Post
+
+NUMBER_OF_ITEMS = 20
+TITLE_WORDS = 8
+
+
+class PostsFeed(Feed):
+    """Последние посты; atom=True — в формате Atom вместо RSS 2.0."""
+
+    def __init__(self, atom=False):
+        if atom:
+            self.feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).select_related('author', 'group').order_by(
+            '-pub_date', '-id'
+        )[:NUMBER_OF_ITEMS]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(TITLE_WORDS)
+
+    def item_description(self, post):
+        return linebreaks(post.text, autoescape=True)
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group else []
+
+
+class IndexFeed(PostsFeed):
+    link = '/'
+
+    def title(self, obj):
+        return 'Yatube: последние обновления на сайте'
+
+    def description(self, obj):
+        return 'Новые посты всех авторов'
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_posts', args=[group.slug])
+
+    def posts(self, group):
+        return group.posts
+
+
+class ProfileFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Посты пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def posts(self, author):
+        return author.posts
+
+
+def index_scopes(request):
+    return ['posts']
+
+
+def group_scopes(request, slug):
+    group_id = get_object_or_404(
+        Group.objects.values_list('pk', flat=True), slug=slug
+    )
+    return [f'group:{group_id}']
+
+
+def profile_scopes(request, username):
+    author_id = get_object_or_404(
+        User.objects.values_list('pk', flat=True), username=username
+    )
+    return [f'profile:{author_id}']
+
+
+def cached_feed(feed, scopes_func):
+    """Представление ленты: 304 по версиям областей, тело из кеша.
+
+    scopes_func получает аргументы представления, отвечает 404 на
+    несуществующий объект и возвращает области ленты; ей разрешены только
+    дешёвые запросы по индексу.
+    """
+    def state(request, *args, **kwargs):
+        if not hasattr(request, '_feed_state'):
+            scopes = scopes_func(request, *args, **kwargs)
+            version = ':'.join(map(str, [
+                settings.RELEASE, *cache.get_versions(*scopes)
+            ]))
+            request._feed_state = scopes, version
+        return request._feed_state
+
+    def etag(request, *args, **kwargs):
+        _, version = state(request, *args, **kwargs)
+        return hashlib.md5(
+            f'{request.path}:{version}'.encode()
+        ).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        scopes, _ = state(request, *args, **kwargs)
+        return cache.get_modified(*scopes)
+
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    def view(request, *args, **kwargs):
+        _, version = state(request, *args, **kwargs)
+
+        def compute():
+            response = feed(request, *args, **kwargs)
+            return response.content, response['Content-Type']
+
+        # Ссылки в ленте абсолютные: ключ зависит от схемы и хоста.
+        digest = hashlib.md5(
+            request.build_absolute_uri(request.path).encode()
+        ).hexdigest()
+        content, content_type = cache.get_or_compute(
+            f'syndication:{digest}', version, compute,
+            settings.FEED_CACHE_TIMEOUT,
+            stale=lambda: cache.mark_stale(request)
+        )
+        return HttpResponse(content, content_type=content_type)
+
+    return cache.stale_aware(view)
+
+
+index_rss = cached_feed(IndexFeed(), index_scopes)
+index_atom = cached_feed(IndexFeed(atom=True), index_scopes)
+group_rss = cached_feed(GroupFeed(), group_scopes)
+group_atom = cached_feed(GroupFeed(atom=True), group_scopes)
+profile_rss = cached_feed(ProfileFeed(), profile_scopes)
+profile_atom = cached_feed(ProfileFeed(atom=True), profile_scopes)
@@ -0,0 +1,182 @@
+"""Сборка мусора в медиа.
+
+collect находит и удаляет то, на что больше никто не ссылается:
+
+1. записи хранилища ключей sorl-thumbnail о картинках, файла которых нет
+   или которые больше не нужны постам, вместе с их миниатюрами;
+2. файлы в posts/: картинки и варианты без ссылок в ImageBlob (или в
+   Post.image для старых имён) и недописанные загрузки;
+3. файлы миниатюр в cache/, о которых хранилище ключей не знает.
+
+Хранилище и таблицы читаются пачками по BATCH_SIZE, так что память не
+зависит от числа файлов. Файлы моложе GRACE_PERIOD не трогаются: их пост
+мог ещё не закоммититься.
+"""
+import posixpath
+from collections import Counter
+from datetime import timedelta
+from itertools import islice
+
+from django.utils import timezone
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore
+
+from .models import ImageBlob, Post
+from .storage import TEMP_SUFFIX
+
+BATCH_SIZE = 500
+GRACE_PERIOD = timedelta(hours=1)
+POSTS_DIRECTORY = 'posts/'
+
+
+def _walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in sorted(files):
+        yield posixpath.join(directory, name)
+    for name in sorted(directories):
+        yield from _walk(storage, posixpath.join(directory, name))
+
+
+def _batches(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def _keys(prefix):
+    """Ключи хранилища sorl-thumbnail с префиксом, пачками по ключу."""
+    last = ''
+    while True:
+        batch = list(
+            KVStore.objects.filter(
+                key__startswith=prefix, key__gt=last
+            ).order_by('key').values_list('key', 'value')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0]
+
+
+def _referenced(names):
+    """Какие из файлов в posts/ нужны постам."""
+    names = list(names)
+    return set(
+        ImageBlob.objects.filter(name__in=names).values_list('name', flat=True)
+    ) | set(
+        Post.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+
+
+class Collector:
+    def __init__(self, dry_run=False, grace=GRACE_PERIOD, log=None):
+        self.dry_run = dry_run
+        self.deadline = timezone.now() - grace
+        self.log = log or (lambda kind, name: None)
+        self.report = Counter()
+
+    def _found(self, kind, name, size=0):
+        self.report[kind] += 1
+        self.report['bytes'] += size
+        self.log(kind, name)
+
+    def _old(self, storage, name):
+        return storage.get_modified_time(name) < self.deadline
+
+    def collect_kvstore(self):
+        for batch in _keys(add_prefix('', 'image')):
+            images = [deserialize_image_file(value) for _, value in batch]
+            referenced = _referenced(
+                image.name for image in images
+                if image.name.startswith(POSTS_DIRECTORY)
+            )
+            for image in images:
+                if image.name.startswith(POSTS_DIRECTORY):
+                    dead = image.name not in referenced
+                else:
+                    dead = not image.exists()
+                if dead:
+                    self._drop_entry(image)
+        # Списки миниатюр, чья исходная картинка пропала из хранилища.
+        for batch in _keys(add_prefix('', 'thumbnails')):
+            sources = {add_prefix(del_prefix(key)): key for key, _ in batch}
+            alive = set(KVStore.objects.filter(
+                key__in=list(sources)
+            ).values_list('key', flat=True))
+            for source, key in sources.items():
+                if source not in alive:
+                    self._drop_thumbnails(del_prefix(key))
+
+    def _drop_entry(self, image):
+        self._found('kvstore', image.name)
+        self._drop_thumbnails(image.key)
+        if not self.dry_run:
+            default.kvstore.delete(image, delete_thumbnails=False)
+
+    def _drop_thumbnails(self, key):
+        for thumbnail_key in default.kvstore._get(
+            key, identity='thumbnails'
+        ) or []:
+            thumbnail = default.kvstore._get(thumbnail_key)
+            if thumbnail is None:
+                continue
+            self._found('kvstore', thumbnail.name)
+            if thumbnail.exists():
+                self._found(
+                    'thumbnails', thumbnail.name, thumbnail.storage.size(
+                        thumbnail.name
+                    )
+                )
+            if not self.dry_run:
+                default.kvstore.delete(thumbnail, delete_thumbnails=False)
+                thumbnail.delete()
+        if not self.dry_run:
+            default.kvstore._delete(key, identity='thumbnails')
+
+    def collect_originals(self):
+        storage = Post._meta.get_field('image').storage
+        if not storage.exists(POSTS_DIRECTORY):
+            return
+        for batch in _batches(_walk(storage, POSTS_DIRECTORY)):
+            referenced = _referenced(batch)
+            for name in batch:
+                if name in referenced or not self._old(storage, name):
+                    continue
+                kind = 'uploads' if name.endswith(TEMP_SUFFIX) else 'originals'
+                self._found(kind, name, storage.size(name))
+                if not self.dry_run:
+                    delete(ImageFile(name, storage))
+
+    def collect_thumbnails(self):
+        storage = default.storage
+        prefix = sorl_settings.THUMBNAIL_PREFIX
+        if not storage.exists(prefix):
+            return
+        for batch in _batches(_walk(storage, prefix.rstrip('/'))):
+            keys = {
+                add_prefix(ImageFile(name, storage).key): name
+                for name in batch
+            }
+            known = set(KVStore.objects.filter(
+                key__in=list(keys)
+            ).values_list('key', flat=True))
+            for key, name in keys.items():
+                if key in known or not self._old(storage, name):
+                    continue
+                self._found('thumbnails', name, storage.size(name))
+                if not self.dry_run:
+                    storage.delete(name)
+
+
+def collect(dry_run=False, grace=GRACE_PERIOD, log=None):
+    """Удаляет мусор в медиа и возвращает отчёт: сколько чего найдено."""
+    collector = Collector(dry_run, grace, log)
+    collector.collect_kvstore()
+    collector.collect_originals()
+    collector.collect_thumbnails()
+    return collector.report
@@ -0,0 +1,366 @@
+"""Массовая загрузка пользователей, групп, постов и подписок из NDJSON.
+
+Каждая строка — объект с полем type:
+
+    {"type": "user", "username": "leo", "first_name": "Лев"}
+    {"type": "group", "slug": "books", "title": "Книги"}
+    {"type": "post", "author": "leo", "group": "books", "text": "...",
+     "pub_date": "2024-05-01T12:00:00+00:00", "image": "posts/ab/....jpg"}
+    {"type": "follow", "user": "anna", "author": "leo"}
+
+Посты и подписки ссылаются на пользователей по username, на группы по
+slug; id берутся из словарей в памяти, которые загружаются один раз и
+пополняются после каждой пачки, так что на строку не приходится ни
+одного SELECT. Строки копятся в буферах и каждые batch_size строк
+вставляются в одной транзакции (core.sqlite.write), в порядке
+зависимостей: пользователи, группы, посты, подписки. Поэтому пост может
+ссылаться на автора из той же пачки. Пользователи, посты и подписки идут
+кортежами через executemany (insert_rows): на сотнях тысяч строк сборка
+моделей и SQL в bulk_create обходится дороже самой вставки. Строки с
+ошибками и повторы не прерывают загрузку, а считаются в skipped.
+Пароль пользователя принимается только готовым хешем Django (выгрузка с
+другого сайта): хешировать открытые пароли на каждую строку слишком
+долго, а записанные как есть они не пускали бы пользователя на сайт.
+Пользователь без пароля получает непригодный для входа.
+
+Сигналы при такой вставке не срабатывают, поэтому производные данные
+обновляются один раз в finish: счётчики затронутых пользователей, ленты
+подписчиков (одним запросом, timeline.bulk_rebuild), индекс поиска (его
+триггер на время загрузки снят, см. search.deferred), ссылки на картинки
+и версии кеша лент. Картинки постов должны уже лежать в хранилище; их
+миниатюры и варианты ставятся в фоновую очередь posts.thumbnails.
+"""
+import json
+from collections import Counter
+from datetime import datetime
+
+from django.contrib.auth.hashers import (
+    UNUSABLE_PASSWORD_PREFIX, identify_hasher, make_password
+)
+from django.db import connection
+from django.db.models import F, Max
+from django.utils import timezone
+from sorl.thumbnail.images import ImageFile
+
+from core.sqlite import write
+
+from . import cache, counters, thumbnails, timeline, variants
+from .models import Follow, Group, ImageBlob, Post, User
+
+BATCH_SIZE = 5000
+KINDS = ('user', 'group', 'post', 'follow')
+USER_COLUMNS = ('username', 'first_name', 'last_name', 'email', 'password')
+POST_COLUMNS = ('text', 'author_id', 'group_id', 'image', 'pub_date')
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+
+def insert_rows(model, columns, rows, ignore_conflicts=False):
+    """Вставляет кортежи значений columns одним executemany.
+
+    Мимо компилятора bulk_create и без экземпляров моделей, которые
+    стоят дороже самой вставки. Значения уже должны быть в виде для
+    базы; остальные поля, кроме id, получают значения по умолчанию.
+    Возвращает число вставленных строк.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if field.column not in columns and not field.primary_key
+    ]
+    defaults = tuple(
+        field.get_db_prep_save(field.get_default(), connection)
+        for field in fields
+    )
+    quote = connection.ops.quote_name
+    names = [*columns, *(field.column for field in fields)]
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts)} '
+        f'{quote(model._meta.db_table)} '
+        f'({", ".join(map(quote, names))}) '
+        f'VALUES ({", ".join(["%s"] * len(names))}) '
+        f'{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [row + defaults for row in rows])
+        return cursor.rowcount
+
+
+def _text(record, key):
+    value = record.get(key)
+    return value.strip() if isinstance(value, str) else ''
+
+
+def _password(record, default):
+    """Хеш пароля из строки, default без пароля или None для неверного."""
+    password = _text(record, 'password')
+    if not password:
+        return default
+    if password.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return password
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return None
+    return password
+
+
+def _post_values(batch, record):
+    """Значения POST_COLUMNS для строки поста или причина пропуска."""
+    author_id = batch.user_id(_text(record, 'author'))
+    slug = _text(record, 'group')
+    group_id = batch.group_id(slug) if slug else None
+    text = _text(record, 'text')
+    image = record.get('image') or None
+    try:
+        pub_date = datetime.fromisoformat(record.get('pub_date'))
+    except (TypeError, ValueError):
+        pub_date = None
+    if author_id is None:
+        return 'post без автора'
+    if slug and group_id is None:
+        return 'post без группы'
+    if not text:
+        return 'post без текста'
+    if record.get('pub_date') and pub_date is None:
+        return 'post с неверной датой'
+    if image is not None and not isinstance(image, str):
+        return 'post с неверной картинкой'
+    if pub_date is not None and timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date, timezone.utc)
+    return text, author_id, group_id, image, pub_date
+
+
+class _Batch:
+    """Итоги одной пачки; переносятся в Importer после коммита."""
+
+    def __init__(self, users, groups):
+        # Словари загрузчика не трогаем: при повторе транзакции id из
+        # откаченной вставки не должны в них остаться.
+        self.known_users = users
+        self.known_groups = groups
+        self.users = {}
+        self.groups = {}
+        self.created = Counter()
+        self.skipped = Counter()
+        self.touched = set()
+        self.authors = set()
+        self.group_ids = set()
+        self.images = Counter()
+
+    def user_id(self, username):
+        return self.known_users.get(username) or self.users.get(username)
+
+    def group_id(self, slug):
+        return self.known_groups.get(slug) or self.groups.get(slug)
+
+
+class Importer:
+    """Загрузчик строк NDJSON: feed на каждую строку, в конце finish."""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.buffers = {kind: [] for kind in KINDS}
+        self.pending = 0
+        self.created = Counter()
+        self.skipped = Counter()
+        # Пользователи, у которых поменялись счётчики, и авторы, чьи
+        # посты или подписчики поменялись: им пересобираются ленты.
+        self.touched = set()
+        self.authors = set()
+        self.group_ids = set()
+        self.images = Counter()
+        self.last_post = Post.objects.aggregate(Max('pk'))['pk__max'] or 0
+        self.password = make_password(None)
+
+    def feed(self, line):
+        """Разбирает строку и вставляет пачку, когда буфер заполнен."""
+        line = line.strip()
+        if not line:
+            return
+        try:
+            record = json.loads(line)
+        except ValueError:
+            self.skipped['не JSON'] += 1
+            return
+        kind = record.get('type') if isinstance(record, dict) else None
+        if kind not in self.buffers:
+            self.skipped['неизвестный type'] += 1
+            return
+        self.buffers[kind].append(record)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def load(self, lines):
+        for line in lines:
+            self.feed(line)
+        return self
+
+    def flush(self):
+        """Вставляет накопленные строки одной транзакцией."""
+        if not self.pending:
+            return
+        buffers = self.buffers
+        self.buffers = {kind: [] for kind in KINDS}
+        self.pending = 0
+        batch = write(self._insert, buffers)
+        self.users.update(batch.users)
+        self.groups.update(batch.groups)
+        self.group_ids |= batch.group_ids
+        self.created.update(batch.created)
+        self.skipped.update(batch.skipped)
+        self.touched |= batch.touched
+        self.authors |= batch.authors
+        self.images.update(batch.images)
+
+    def _insert(self, buffers):
+        batch = _Batch(self.users, self.groups)
+        self._users(batch, buffers['user'])
+        self._groups(batch, buffers['group'])
+        self._posts(batch, buffers['post'])
+        self._follows(batch, buffers['follow'])
+        self._blobs(batch.images)
+        return batch
+
+    def _users(self, batch, records):
+        new = {}
+        for record in records:
+            username = _text(record, 'username')
+            password = _password(record, self.password)
+            if not username:
+                batch.skipped['user без username'] += 1
+            elif password is None:
+                batch.skipped['user с неверным паролем'] += 1
+            elif batch.user_id(username) or username in new:
+                batch.skipped['user уже есть'] += 1
+            else:
+                new[username] = (
+                    username,
+                    _text(record, 'first_name'),
+                    _text(record, 'last_name'),
+                    _text(record, 'email'),
+                    password,
+                )
+        if not new:
+            return
+        last = User.objects.aggregate(Max('pk'))['pk__max'] or 0
+        insert_rows(User, USER_COLUMNS, new.values())
+        # id новых строк дочитываем по диапазону, а не по списку имён,
+        # который упёрся бы в лимит параметров запроса.
+        batch.users.update(
+            User.objects.filter(pk__gt=last).values_list('username', 'pk')
+        )
+        batch.created['user'] += len(new)
+
+    def _groups(self, batch, records):
+        new = {}
+        for record in records:
+            slug = _text(record, 'slug')
+            if not slug:
+                batch.skipped['group без slug'] += 1
+            elif batch.group_id(slug) or slug in new:
+                batch.skipped['group уже есть'] += 1
+            else:
+                new[slug] = Group(
+                    slug=slug,
+                    title=_text(record, 'title') or slug,
+                    description=_text(record, 'description'),
+                )
+        if not new:
+            return
+        last = Group.objects.aggregate(Max('pk'))['pk__max'] or 0
+        Group.objects.bulk_create(new.values())
+        batch.groups.update(
+            Group.objects.filter(pk__gt=last).values_list('slug', 'pk')
+        )
+        batch.created['group'] += len(new)
+
+    def _posts(self, batch, records):
+        posts = []
+        now = timezone.now()
+        adapt_date = connection.ops.adapt_datetimefield_value
+        for record in records:
+            values = _post_values(batch, record)
+            if isinstance(values, str):
+                batch.skipped[values] += 1
+                continue
+            text, author_id, group_id, image, pub_date = values
+            posts.append((
+                text, author_id, group_id, image,
+                adapt_date(pub_date or now),
+            ))
+            batch.touched.add(author_id)
+            batch.authors.add(author_id)
+            if group_id is not None:
+                batch.group_ids.add(group_id)
+            if image:
+                batch.images[image] += 1
+        if posts:
+            batch.created['post'] += insert_rows(Post, POST_COLUMNS, posts)
+
+    def _follows(self, batch, records):
+        pairs = set()
+        for record in records:
+            user_id = batch.user_id(_text(record, 'user'))
+            author_id = batch.user_id(_text(record, 'author'))
+            if user_id is None or author_id is None:
+                batch.skipped['follow без пользователя'] += 1
+            elif user_id == author_id:
+                batch.skipped['follow на себя'] += 1
+            elif (user_id, author_id) in pairs:
+                batch.skipped['follow уже есть'] += 1
+            else:
+                pairs.add((user_id, author_id))
+                batch.touched.update((user_id, author_id))
+                batch.authors.add(author_id)
+        if not pairs:
+            return
+        # Подписки, которые уже есть в базе, отбрасывает UNIQUE.
+        created = insert_rows(
+            Follow, ('user_id', 'author_id'), sorted(pairs),
+            ignore_conflicts=True,
+        )
+        batch.created['follow'] += created
+        if created < len(pairs):
+            batch.skipped['follow уже есть'] += len(pairs) - created
+
+    def _blobs(self, images):
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name, refs=0) for name in images],
+            ignore_conflicts=True,
+        )
+        for name, refs in images.items():
+            ImageBlob.objects.filter(name=name).update(refs=F('refs') + refs)
+
+    def finish(self, enqueue_images=True, log=None):
+        """Досылает остаток и обновляет то, что обычно делают сигналы.
+
+        Возвращает число картинок, поставленных в очередь.
+        """
+        log = log or (lambda message: None)
+        self.flush()
+        log('Счётчики')
+        counters.recount_users(self.touched)
+        log('Ленты подписок')
+        # Одним INSERT ... SELECT на всех авторов: по автору за раз
+        # пересборка шла дольше самой загрузки.
+        write(timeline.bulk_rebuild, self.authors)
+        # Новые подписки меняют ленты и кнопки в профилях подписчиков.
+        cache.bump(
+            'posts',
+            *(f'group:{pk}' for pk in sorted(self.group_ids)),
+            *(f'profile:{pk}' for pk in sorted(self.touched)),
+            *(f'follow:{pk}' for pk in sorted(self.touched)),
+        )
+        if not enqueue_images:
+            return 0
+        log('Картинки в очередь')
+        for name in self.images:
+            thumbnails.enqueue(ImageFile(name, IMAGE_STORAGE))
+        posts = list(Post.objects.filter(pk__gt=self.last_post).exclude(
+            image=''
+        ).exclude(image=None).values_list('pk', flat=True))
+        for pk in posts:
+            thumbnails.submit(variants.build, pk)
+        return len(self.images)
@@ -0,0 +1,89 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import data, report, runner
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу данными нужного масштаба, гоняет все страницы '
+        'posts под нагрузкой и сравнивает с базовым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=data.SCALES, default='small',
+            help='Размер генерируемых данных, если база пуста.'
+        )
+        for name in ('users', 'groups', 'posts', 'comments'):
+            parser.add_argument(
+                f'--{name}', type=int,
+                help=f'Сколько создать: {name} (вместо значения из --scale).'
+            )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--mode', choices=runner.DRIVERS, default='client',
+            help='Тестовый клиент в процессе или HTTP к WSGI-серверу.'
+        )
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--rounds', type=int, default=20,
+            help='Сколько раз пройти все страницы.'
+        )
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument(
+            '--baseline',
+            help='JSON прошлого прогона, с которым сравнить этот.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95, доля от базового.'
+        )
+
+    def handle(self, *args, **options):
+        scale = {
+            name: options[name] if options[name] is not None else value
+            for name, value in data.SCALES[options['scale']].items()
+        }
+        if Post.objects.exists():
+            self.stdout.write('В базе уже есть посты: генерация пропущена')
+        else:
+            created = data.generate(
+                seed=options['seed'], log=self.stdout.write, **scale
+            )
+            self.stdout.write(f'Создано: {created}')
+        samples = runner.run(
+            options['mode'], options['concurrency'], options['rounds'],
+            options['warmup'],
+        )
+        summary = report.summarize(
+            samples, scale=scale, seed=options['seed'],
+            mode=options['mode'], concurrency=options['concurrency'],
+            rounds=options['rounds'],
+        )
+        for name, view in summary['views'].items():
+            self.stdout.write(
+                f'{name:28} p50 {view["p50_ms"]:>8} мс  '
+                f'p95 {view["p95_ms"]:>8} мс  p99 {view["p99_ms"]:>8} мс  '
+                f'запросов {view["queries"]}  ошибок {view["errors"]}'
+            )
+        self.stdout.write(f'Пиковая память: {summary["rss_mb"]} МБ')
+        report.save(options['output'], summary)
+        baseline = options['baseline']
+        if not baseline:
+            return
+        if not os.path.exists(baseline):
+            report.save(baseline, summary)
+            self.stdout.write(f'Базовый прогон сохранён в {baseline}')
+            return
+        regressions = report.compare(
+            summary, report.load(baseline), options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Хуже базового прогона:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Не хуже базового прогона'))
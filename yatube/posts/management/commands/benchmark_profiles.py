@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks import profiles, report
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает профили настроек development и production: запуск '
+        'процесса, первый запрос и задержки страниц posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rounds', type=int, default=10,
+            help='Сколько раз пройти все страницы в каждом профиле.'
+        )
+        parser.add_argument(
+            '--output', help='Куда сохранить сводки профилей в JSON.'
+        )
+
+    def handle(self, *args, **options):
+        summaries = {
+            profile: profiles.measure(profile, options['rounds'])
+            for profile in profiles.PROFILES
+        }
+        self.stdout.write(
+            f'{"":32}' + ''.join(f'{name:>14}' for name in summaries)
+        )
+        rows = [
+            ('запуск, мс', 'startup_ms'),
+            ('первый запрос, мс', 'first_request_ms'),
+        ]
+        for title, key in rows:
+            self.stdout.write(f'{title:32}' + ''.join(
+                f'{summary[key]:>14}' for summary in summaries.values()
+            ))
+        for view in summaries[profiles.PROFILES[0]]['views']:
+            self.stdout.write(f'{view + " p50, мс":32}' + ''.join(
+                f'{summary["views"][view]["p50_ms"]:>14}'
+                for summary in summaries.values()
+            ))
+        if options['output']:
+            report.save(options['output'], summaries)
+        self.stdout.write(self.style.SUCCESS('Профили сравнены'))
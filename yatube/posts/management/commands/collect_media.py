@@ -0,0 +1,65 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import garbage
+
+KINDS = {
+    'originals': 'картинок и вариантов',
+    'uploads': 'недописанных загрузок',
+    'thumbnails': 'файлов миниатюр',
+    'kvstore': 'записей sorl-thumbnail',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, миниатюры и записи sorl-thumbnail, на которые '
+        'не осталось ссылок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.'
+        )
+        parser.add_argument(
+            '--grace', type=int,
+            default=int(garbage.GRACE_PERIOD.total_seconds()),
+            help='Не трогать файлы моложе стольких секунд.'
+        )
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Повторять сборку каждые столько секунд.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.collect(options)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def collect(self, options):
+        log = None
+        if options['verbosity'] > 1 or options['dry_run']:
+            def log(kind, name):
+                self.stdout.write(f'{kind}: {name}')
+        report = garbage.collect(
+            dry_run=options['dry_run'],
+            grace=timedelta(seconds=options['grace']),
+            log=log,
+        )
+        found = ', '.join(
+            f'{title}: {report[kind]}' for kind, title in KINDS.items()
+        )
+        megabytes = report['bytes'] / 2 ** 20
+        if options['dry_run']:
+            self.stdout.write(
+                f'Будет удалено {found}; освободится {megabytes:.1f} МБ'
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено {found}; освобождено {megabytes:.1f} МБ'
+        ))
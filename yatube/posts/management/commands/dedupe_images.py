@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts import blobs
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки, загруженные под исходными именами, в '
+        'хранилище по содержимому и удаляет дубли.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, какие картинки будут перенесены.'
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = blobs.legacy_names()
+        if options['dry_run']:
+            for name in names:
+                self.stdout.write(name)
+            self.stdout.write(f'Будет перенесено картинок: {len(names)}')
+            return
+        targets = set()
+        for name in names:
+            if not storage.exists(name):
+                self.stderr.write(f'Файл не найден: {name}')
+                continue
+            new_name = blobs.adopt(name, storage)
+            targets.add(new_name)
+            self.stdout.write(f'{name} -> {new_name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок под старыми именами: {len(names)}, '
+            f'уникальных после переноса: {len(targets)}'
+        ))
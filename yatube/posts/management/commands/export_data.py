@@ -0,0 +1,71 @@
+from contextlib import ExitStack
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии, подписки или группы в NDJSON или '
+        'CSV потоком, не держа таблицу в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=export.EXPORTS)
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='ndjson'
+        )
+        parser.add_argument(
+            '--since',
+            help='Только строки новее этой даты (ISO 8601), для постов и '
+                 'комментариев.'
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+            help='Сколько строк читать из курсора за раз.'
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        watermark = export.date_field(kind)
+        last = {}
+
+        def tracked(rows):
+            # Метка последней строки — since для следующей выгрузки.
+            for row in rows:
+                if watermark:
+                    last['since'] = row[watermark]
+                yield row
+
+        try:
+            rows = export.rows(
+                kind, export.parse_since(options['since']),
+                options['chunk_size']
+            )
+            lines = export.format_lines(options['format'], kind, tracked(rows))
+        except export.ExportError as error:
+            raise CommandError(error)
+        with ExitStack() as stack:
+            if options['output']:
+                write = stack.enter_context(open(
+                    options['output'], 'w', encoding='utf-8', newline=''
+                )).write
+            else:
+                write = partial(self.stdout.write, ending='')
+            count = 0
+            for line in lines:
+                write(line)
+                count += 1
+        if options['format'] == 'csv':
+            count -= 1
+        self.stderr.write(f'Выгружено строк: {count}')
+        if 'since' in last:
+            self.stderr.write(
+                f'Следующая выгрузка: --since {last["since"].isoformat()}'
+            )
+        self.stderr.write(self.style.SUCCESS('Выгрузка закончена'))
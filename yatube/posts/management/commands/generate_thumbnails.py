@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails, variants
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Нарезает миниатюры и адаптивные варианты картинок уже '
+        'опубликованных постов.'
+    )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        images = (
+            post.image for post in posts.only('image').iterator()
+        )
+        generated = thumbnails.generate(images)
+        futures = [
+            thumbnails.submit(variants.build, pk)
+            for pk in posts.filter(image_variants='').values_list(
+                'pk', flat=True
+            ).iterator()
+        ]
+        for future in futures:
+            future.result()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано миниатюр: {generated}, '
+            f'постов с вариантами: {len(futures)}'
+        ))
@@ -0,0 +1,59 @@
+import sys
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+
+from posts import importer, search
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, группы, посты и подписки из NDJSON '
+        'пачками через bulk_create и пересчитывает производные данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file', help='Файл NDJSON или - для чтения из stdin.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE,
+            help='Сколько строк вставлять за одну транзакцию.'
+        )
+        parser.add_argument(
+            '--no-thumbnails', action='store_false', dest='thumbnails',
+            help='Не ставить миниатюры в очередь: их нарежет '
+                 'generate_thumbnails или первый показ.'
+        )
+
+    def handle(self, *args, **options):
+        loader = importer.Importer(options['batch_size'])
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            if options['file'] == '-':
+                lines = sys.stdin
+            else:
+                lines = stack.enter_context(
+                    open(options['file'], encoding='utf-8')
+                )
+            with search.deferred():
+                loader.load(lines)
+                loader.flush()
+        loaded = time.perf_counter() - started
+        rows = sum(loader.created.values())
+        self.stdout.write(
+            f'Вставлено строк: {rows} за {loaded:.1f} с '
+            f'({rows / max(loaded, 1e-9):.0f} строк/с без пересчёта)'
+        )
+        for kind in importer.KINDS:
+            self.stdout.write(f'  {kind}: {loader.created[kind]}')
+        for reason, count in sorted(loader.skipped.items()):
+            self.stdout.write(f'  пропущено, {reason}: {count}')
+        queued = loader.finish(options['thumbnails'], log=self.stdout.write)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка закончена за {elapsed:.1f} с '
+            f'({rows / max(elapsed, 1e-9):.0f} строк/с с пересчётом), '
+            f'картинок в очереди: {queued}'
+        ))
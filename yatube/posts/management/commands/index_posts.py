@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Заполняет полнотекстовый индекс постов пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов индексировать за одну транзакцию.'
+        )
+
+    def handle(self, *args, **options):
+        search.install()
+        indexed = search.reindex(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {indexed}')
+        )
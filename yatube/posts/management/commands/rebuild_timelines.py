@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересобрать только посты этих авторов.'
+        )
+
+    def handle(self, *args, **options):
+        authors = None
+        if options['usernames']:
+            authors = User.objects.filter(username__in=options['usernames'])
+        rebuilt = timeline.rebuild(authors)
+        self.stdout.write(
+            self.style.SUCCESS(f'Разослано постов по лентам: {rebuilt}')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с базой и чинит расхождения.'
+
+    def handle(self, *args, **options):
+        for counter, fixed in counters.recount().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
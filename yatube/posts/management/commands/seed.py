@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import data
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет пустую базу воспроизводимыми данными: пользователи, '
+        'группы, посты со скошенным авторством, комментарии, подписки '
+        'и картинки из небольшого пула.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=data.SCALES, default='small',
+            help='Размер данных: от tiny до large (миллион постов). '
+                 'На SQLite миллион постов без комментариев (--comments 0) '
+                 'создаётся меньше чем за минуту; полный large с двумя '
+                 'миллионами комментариев — около 80 секунд, из них '
+                 'поисковый индекс и индексы таблиц — около 40.'
+        )
+        for name in ('users', 'groups', 'posts', 'comments'):
+            parser.add_argument(
+                f'--{name}', type=int,
+                help=f'Сколько создать: {name} (вместо значения из --scale).'
+            )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Одинаковый seed и размер дают одинаковую базу.'
+        )
+        parser.add_argument(
+            '--images', type=int, default=data.IMAGES,
+            help='Сколько файлов в пуле картинок; 0 — посты без картинок.'
+        )
+        parser.add_argument(
+            '--timelines', action='store_true',
+            help='Сразу разослать посты по лентам подписчиков; без этого '
+                 'ленты собираются при чтении или командой '
+                 'rebuild_timelines.'
+        )
+
+    def handle(self, *args, **options):
+        if Post.objects.exists():
+            raise CommandError('В базе уже есть посты: seed заполняет пустую')
+        scale = {
+            name: options[name] if options[name] is not None else value
+            for name, value in data.SCALES[options['scale']].items()
+        }
+        started = time.perf_counter()
+
+        def log(message):
+            self.stdout.write(
+                f'{time.perf_counter() - started:6.1f} с  {message}'
+            )
+
+        created = data.generate(
+            seed=options['seed'], images=options['images'],
+            timelines=options['timelines'], log=log, **scale
+        )
+        elapsed = time.perf_counter() - started
+        rows = sum(
+            created[name]
+            for name in ('users', 'groups', 'posts', 'comments', 'follows')
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {created} за {elapsed:.1f} с '
+            f'({rows / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
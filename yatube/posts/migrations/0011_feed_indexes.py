@@ -0,0 +1,71 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:55
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def remove_bad_follows(apps, schema_editor):
+    """Удаляет дубли и подписки на себя перед созданием ограничений."""
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    seen = set()
+    bad = []
+    for pk, user_id, author_id in Follow.objects.order_by('pk').values_list(
+        'pk', 'user_id', 'author_id'
+    ):
+        if user_id == author_id or (user_id, author_id) in seen:
+            bad.append((pk, user_id, author_id))
+        seen.add((user_id, author_id))
+    for pk, user_id, author_id in bad:
+        Follow.objects.filter(pk=pk).delete()
+        UserStats.objects.filter(user_id=author_id).update(
+            followers_count=F('followers_count') - 1
+        )
+        UserStats.objects.filter(user_id=user_id).update(
+            following_count=F('following_count') - 1
+        )
+        if user_id == author_id:
+            TimelineEntry.objects.filter(
+                user_id=user_id, author_id=author_id
+            ).delete()
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_bad_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['in_timelines', '-pub_date', '-id'], name='post_pulled_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='follow_not_self'),
+        ),
+    ]
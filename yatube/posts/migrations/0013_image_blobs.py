@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:10
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_blobs(apps, schema_editor):
+    """Считает ссылки на уже загруженные картинки."""
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    images = Post.objects.exclude(image='').exclude(image=None).order_by()
+    ImageBlob.objects.bulk_create(
+        [
+            ImageBlob(name=name, refs=refs)
+            for name, refs in images.values_list('image').annotate(
+                Count('pk')
+            )
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Файл')),
+                ('refs', models.IntegerField(default=0, verbose_name='Число ссылок')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:16
+
+import json
+
+from django.db import migrations, models
+from django.db.models import F
+import posts.storage
+
+
+def count_variants(apps, schema_editor):
+    """Учитывает ссылки на уже нарезанные адаптивные варианты."""
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    manifests = Post.objects.exclude(image_variants='').values_list(
+        'image_variants', flat=True
+    )
+    for manifest in manifests.iterator():
+        for entries in json.loads(manifest).values():
+            if not isinstance(entries, list):
+                continue
+            for _, path in entries:
+                ImageBlob.objects.bulk_create(
+                    [ImageBlob(name=path)], ignore_conflicts=True
+                )
+                ImageBlob.objects.filter(name=path).update(
+                    refs=F('refs') + 1
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_image_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_variants, migrations.RunPython.noop),
+    ]
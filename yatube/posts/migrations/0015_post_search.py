@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:02
+
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from posts import search
+    search.install(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from posts import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_media_references'),
+    ]
+
+    operations = [
+        # Индекс заполняет команда index_posts пачками, не блокируя migrate.
+        migrations.RunPython(install, uninstall),
+    ]
@@ -1,6 +1,10 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 SYMBOLS_OF_POST = 15
 
@@ -32,15 +36,56 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
+        db_index=True,
         blank=True, null=True
     )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        default='',
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    in_timelines = models.BooleanField(
+        'Разослан в ленты подписчиков',
+        default=False,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['in_timelines', '-pub_date', '-id'],
+                name='post_pulled_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:SYMBOLS_OF_POST]
 
+    @property
+    def variants(self):
+        """Манифест адаптивных вариантов картинки из posts.variants."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -78,6 +123,14 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -90,3 +143,73 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
         blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='follow_not_self'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class ImageBlob(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+    name = models.CharField('Файл', max_length=255, primary_key=True)
+    refs = models.IntegerField('Число ссылок', default=0)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,175 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SEPARATOR = '|'
+# Дальше старые ссылки ?page=N не листаются: OFFSET растёт с номером.
+MAX_PAGE_NUMBER = 50
+
+
+def encode_token(value, pk):
+    """Кодирует пару (значение ключа, id) в непрозрачный токен."""
+    raw = f'{value}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token, parse):
+    """Возвращает (parse(значение), id) из токена или None, если он битый.
+
+    parse разбирает строку значения и отвечает None или ValueError на
+    неверную.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)
+        ).decode()
+        value, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        value = parse(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+def encode_key(date, pk):
+    """Кодирует ключ (дата, id) в непрозрачный токен."""
+    return encode_token(date.isoformat(), pk)
+
+
+def encode_cursor(post, date_field='pub_date'):
+    """Кодирует ключ (pub_date, id) поста в непрозрачный токен."""
+    return encode_key(getattr(post, date_field), post.pk)
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id) из токена или None, если токен битый."""
+    return decode_token(token, parse_datetime)
+
+
+def seek(queryset, cursor, reverse=False, date_field='pub_date',
+         pk_field='pk'):
+    """Сортирует queryset по ключу и отсекает записи до курсора.
+
+    По умолчанию лента идёт от новых к старым; reverse=True нужен,
+    чтобы листать назад от курсора. Глубокий курсор стоит столько же,
+    сколько первая страница: поиск начинается с его даты в индексе.
+    """
+    prefix, lookup = ('', 'gt') if reverse else ('-', 'lt')
+    queryset = queryset.order_by(prefix + date_field, prefix + pk_field)
+    if cursor:
+        pub_date, pk = cursor
+        # Простая граница по дате даёт SQLite диапазон в индексе: одно
+        # условие с OR он читает проходом по индексу с самого начала.
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{date_field: pub_date, f'{pk_field}__{lookup}': pk}),
+            **{f'{date_field}__{lookup}e': pub_date}
+        )
+    return queryset
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Страница ищется условием по ключу последнего (или первого) поста
+    предыдущей выдачи, поэтому глубокая страница стоит столько же,
+    сколько первая. Возвращает обычный Page, а номер страницы и
+    num_pages описывают только текущее окно: есть ли соседние страницы.
+
+    date_field и ascending задают другой ключ и порядок, например
+    комментарии по (created, id) от старых к новым.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 ascending=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.date_field = date_field
+        self.ascending = ascending
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + 1 if self._has_next else self._number
+
+    def get_page(self, number=None, after=None, before=None):
+        """Возвращает страницу после/до курсора или по старому ?page=."""
+        after = decode_cursor(after)
+        before = decode_cursor(before)
+        if after:
+            return self._page_after(after)
+        if before:
+            return self._page_before(before)
+        try:
+            number = int(number or 1)
+        except (TypeError, ValueError):
+            number = 1
+        if 1 < number <= MAX_PAGE_NUMBER:
+            return self._page_number(number)
+        return self._page_after(None)
+
+    def _query(self, cursor, reverse=False, offset=0):
+        """Возвращает до per_page + 1 объектов за курсором."""
+        queryset = seek(
+            self.object_list, cursor, reverse != self.ascending,
+            self.date_field
+        )
+        return list(queryset[offset:offset + self.per_page + 1])
+
+    def page_state(self, page):
+        """Данные страницы для кеша, без queryset пагинатора."""
+        return (
+            list(page.object_list), page.number, self._has_next,
+            page.next_cursor, page.previous_cursor
+        )
+
+    def restore_page(self, state):
+        """Собирает Page из page_state без запросов к базе."""
+        posts, number, has_next, next_cursor, previous_cursor = state
+        self._number = number
+        self._has_next = has_next
+        page = Page(posts, number, self)
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+    def _build_page(self, posts, number, has_next):
+        return self.restore_page((
+            posts, number, has_next,
+            encode_cursor(posts[-1], self.date_field) if has_next else '',
+            encode_cursor(posts[0], self.date_field)
+            if number > 1 and posts else ''
+        ))
+
+    def _page_after(self, cursor):
+        posts = self._query(cursor)
+        has_next = len(posts) > self.per_page
+        return self._build_page(
+            posts[:self.per_page], 2 if cursor else 1, has_next
+        )
+
+    def _page_before(self, cursor):
+        posts = self._query(cursor, reverse=True)
+        if len(posts) <= self.per_page:
+            # Дошли до начала ленты: отдаём полную первую страницу.
+            return self._page_after(None)
+        posts = posts[:self.per_page][::-1]
+        return self._build_page(posts, 2, True)
+
+    def _page_number(self, number):
+        # Совместимость со старыми ссылками ?page=N: OFFSET без COUNT(*),
+        # номер уже не больше MAX_PAGE_NUMBER.
+        offset = (number - 1) * self.per_page
+        posts = self._query(None, offset=offset)
+        if not posts and number > 1:
+            return self._page_after(None)
+        return self._build_page(
+            posts[:self.per_page], number, len(posts) > self.per_page
+        )
@@ -0,0 +1,296 @@
+"""Полнотекстовый поиск по постам.
+
+В SQLite текст постов лежит в виртуальной таблице FTS5 (TABLE), которую
+синхронизируют триггеры на posts_post: так индекс не расходится с текстом
+и при bulk_create или update(). Перестройка posts_post миграциями SQLite
+удаляет триггеры, поэтому install() вызывается и после каждого migrate.
+В PostgreSQL вместо таблицы работает GIN-индекс по to_tsvector(text).
+
+Выдача отсортирована по релевантности (bm25 или ts_rank) и листается
+курсором (rank, id) так же, как ленты в posts.paginator. Фрагменты с
+подсвеченными словами строятся только для постов текущей страницы.
+"""
+import re
+from contextlib import contextmanager
+
+from django.core.paginator import Page, Paginator
+from django.db import NotSupportedError, connection, transaction
+from django.db.models import Max
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginator import decode_token, encode_token
+
+TABLE = 'posts_post_fts'
+PG_CONFIG = 'russian'
+PG_INDEX = 'posts_post_text_search_idx'
+MAX_TERMS = 10
+MIN_PREFIX = 3
+SNIPPET_WORDS = 16
+# Непечатные маркеры вместо <mark>: текст поста экранируется после.
+START, STOP = '\x02', '\x03'
+
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"text, tokenize = 'unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_insert AFTER INSERT ON posts_post "
+    f"BEGIN INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_update "
+    f"AFTER UPDATE OF text ON posts_post BEGIN "
+    f"DELETE FROM {TABLE} WHERE rowid = old.id; "
+    f"INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_delete AFTER DELETE ON posts_post "
+    f"BEGIN DELETE FROM {TABLE} WHERE rowid = old.id; END",
+]
+SQLITE_UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {TABLE}_update',
+    f'DROP TRIGGER IF EXISTS {TABLE}_delete',
+    f'DROP TABLE IF EXISTS {TABLE}',
+]
+PG_VECTOR = f"to_tsvector('{PG_CONFIG}', text)"
+PG_QUERY = f"plainto_tsquery('{PG_CONFIG}', %s)"
+
+
+def terms(query):
+    """Слова запроса без операторов: их синтаксис пользователю не нужен."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def _match(query):
+    # Каждое слово в кавычках; длинные ищутся по префиксу, что отчасти
+    # заменяет стемминг, которого у unicode61 нет.
+    return ' '.join(
+        f'"{term}"*' if len(term) >= MIN_PREFIX else f'"{term}"'
+        for term in terms(query)
+    )
+
+
+def _vendor(using=None):
+    vendor = (using or connection).vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        raise NotSupportedError(f'Поиск не поддерживает {vendor}')
+    return vendor
+
+
+def install(using=None):
+    """Создаёт индекс и триггеры, если их ещё нет."""
+    using = using or connection
+    vendor = _vendor(using)
+    with using.cursor() as cursor:
+        if vendor == 'sqlite':
+            for sql in SQLITE_INSTALL:
+                cursor.execute(sql)
+        else:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {PG_INDEX} '
+                f'ON posts_post USING gin ({PG_VECTOR})'
+            )
+
+
+def repair(using=None):
+    """Возвращает триггеры, если migrate пересоздал posts_post."""
+    using = using or connection
+    if using.vendor == 'sqlite' and (
+        TABLE in using.introspection.table_names()
+    ):
+        install(using)
+
+
+def uninstall(using=None):
+    using = using or connection
+    vendor = _vendor(using)
+    with using.cursor() as cursor:
+        if vendor == 'sqlite':
+            for sql in SQLITE_UNINSTALL:
+                cursor.execute(sql)
+        else:
+            cursor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+
+
+@contextmanager
+def deferred():
+    """Откладывает индексацию новых постов до конца блока.
+
+    Для массовой загрузки: триггер вставки снимается, а посты, которым
+    достались id больше прежнего максимума, попадают в индекс одним
+    INSERT ... SELECT на выходе. Правки и удаления индекс видит как обычно.
+    """
+    if _vendor() != 'sqlite':
+        yield
+        return
+    last = Post.objects.aggregate(Max('pk'))['pk__max'] or 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {TABLE}_insert')
+    try:
+        yield
+    finally:
+        install()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {TABLE}(rowid, text) '
+                f'SELECT id, text FROM posts_post WHERE id > %s', [last]
+            )
+
+
+def reindex(batch_size=1000):
+    """Переиндексирует посты пачками по id и возвращает их число.
+
+    Пачка сначала удаляется из индекса, поэтому повторный запуск безопасен.
+    В PostgreSQL индекс строит сама база, считать нечего.
+    """
+    if _vendor() != 'sqlite':
+        return 0
+    indexed = 0
+    last = 0
+    while True:
+        ids = list(
+            Post.objects.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not ids:
+                # Хвост индекса от удалённых постов.
+                cursor.execute(
+                    f'DELETE FROM {TABLE} WHERE rowid > %s', [last]
+                )
+                cursor.execute(
+                    f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')"
+                )
+                return indexed
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid > %s AND rowid <= %s',
+                [last, ids[-1]]
+            )
+            cursor.execute(
+                f'INSERT INTO {TABLE}(rowid, text) SELECT id, text '
+                f'FROM posts_post WHERE id > %s AND id <= %s',
+                [last, ids[-1]]
+            )
+        indexed += len(ids)
+        last = ids[-1]
+
+
+def filter_posts(queryset, query):
+    """Оставляет в queryset посты, подходящие под запрос, без сортировки."""
+    if not terms(query):
+        return queryset.none()
+    if _vendor() == 'sqlite':
+        sql = f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s'
+        params = [_match(query)]
+    else:
+        sql = f'SELECT id FROM posts_post WHERE {PG_VECTOR} @@ {PG_QUERY}'
+        params = [query]
+    # Не pk__in=RawSQL(...): Django 2.2 оборачивает его в IN ((...)), и
+    # SQLite берёт из такого подзапроса только первую строку.
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    return queryset.extra(where=[f'{table}.id IN ({sql})'], params=params)
+
+
+def _ranked(query, cursor, limit):
+    """Возвращает до limit пар (id, rank) за курсором; меньше rank — лучше."""
+    if _vendor() == 'sqlite':
+        ranked = (
+            f'SELECT rowid AS id, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+        )
+        params = [_match(query)]
+    else:
+        ranked = (
+            f'SELECT id, -ts_rank({PG_VECTOR}, {PG_QUERY}) AS rank '
+            f'FROM posts_post WHERE {PG_VECTOR} @@ {PG_QUERY}'
+        )
+        params = [query, query]
+    sql = f'SELECT id, rank FROM ({ranked}) AS ranked'
+    if cursor:
+        sql += ' WHERE rank > %s OR (rank = %s AND id > %s)'
+        params += [cursor[0], cursor[0], cursor[1]]
+    sql += ' ORDER BY rank, id LIMIT %s'
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params + [limit])
+        return db_cursor.fetchall()
+
+
+def _snippets(query, ids):
+    """Фрагменты текста постов с подсвеченными словами запроса."""
+    if _vendor() == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(ids))
+        sql = (
+            f"SELECT rowid, snippet({TABLE}, 0, %s, %s, '…', "
+            f"{SNIPPET_WORDS}) FROM {TABLE} "
+            f"WHERE {TABLE} MATCH %s AND rowid IN ({placeholders})"
+        )
+        params = [START, STOP, _match(query), *ids]
+    else:
+        sql = (
+            f"SELECT id, ts_headline('{PG_CONFIG}', text, {PG_QUERY}, %s) "
+            f"FROM posts_post WHERE id = ANY(%s)"
+        )
+        options = (
+            f'StartSel={START}, StopSel={STOP}, '
+            f'MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}'
+        )
+        params = [query, options, list(ids)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {
+            pk: mark_safe(
+                escape(snippet).replace(START, '<mark>').replace(
+                    STOP, '</mark>'
+                )
+            )
+            for pk, snippet in cursor.fetchall()
+        }
+
+
+def encode_cursor(rank, pk):
+    return encode_token(repr(rank), pk)
+
+
+def decode_cursor(token):
+    """Возвращает (rank, id) из токена или None, если токен битый."""
+    return decode_token(token, float)
+
+
+class SearchPaginator(Paginator):
+    """Выдача поиска по курсору (rank, id), только вперёд.
+
+    У постов страницы есть атрибуты rank и snippet. Как и CursorPaginator,
+    не считает COUNT(*): num_pages описывает только, есть ли следующая.
+    """
+
+    def __init__(self, query, per_page, **kwargs):
+        super().__init__(Post.objects.none(), per_page, **kwargs)
+        self.query = query
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + 1 if self._has_next else self._number
+
+    def get_page(self, after=None):
+        cursor = decode_cursor(after)
+        rows = []
+        if terms(self.query):
+            rows = _ranked(self.query, cursor, self.per_page + 1)
+        self._has_next = len(rows) > self.per_page
+        self._number = 2 if cursor else 1
+        rows = rows[:self.per_page]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows]
+        )
+        snippets = _snippets(self.query, list(posts)) if posts else {}
+        page_posts = []
+        for pk, rank in rows:
+            if pk in posts:
+                post = posts[pk]
+                post.rank = rank
+                post.snippet = snippets.get(pk, '')
+                page_posts.append(post)
+        page = Page(page_posts, self._number, self)
+        page.next_cursor = encode_cursor(*rows[-1][::-1]) if (
+            self._has_next
+        ) else ''
+        return page
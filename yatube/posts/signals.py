@@ -0,0 +1,169 @@
+import json
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import (
+    blobs, cache, counters, search, thumbnails, timeline, variants
+)
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+_deleting = threading.local()
+
+
+def bump_on_commit(*scopes):
+    """Сбрасывает ленты, когда изменение уже видно другим соединениям.
+
+    Если поднять версию внутри транзакции, соседний воркер успеет
+    собрать ленту по снимку без изменения и сохранит её под новой версией.
+    """
+    transaction.on_commit(lambda: cache.bump(*scopes))
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    """Заводит счётчики новому пользователю."""
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    """Название и описание группы показываются на странице её ленты."""
+    if not raw:
+        bump_on_commit(f'group:{instance.pk}')
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    """Запоминает прежние группу, картинку и её варианты."""
+    if instance.pk and not raw:
+        (
+            instance._old_group_id,
+            instance._old_image,
+            instance._old_variants,
+        ) = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'image_variants'
+        ).first() or (None, None, '')
+
+
+def release_image(name, manifest, storage):
+    for path in variants.files(json.loads(manifest) if manifest else {}):
+        blobs.release(path, storage)
+    blobs.release(name, storage)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    """Считает пост и рассылает его по лентам подписчиков."""
+    if raw:
+        return
+    if created:
+        deleting_posts().discard(instance.pk)
+        counters.bump(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+    old_image = getattr(instance, '_old_image', None)
+    if instance.image.name != old_image:
+        old_variants = getattr(instance, '_old_variants', '')
+        blobs.acquire(instance.image.name)
+        release_image(old_image, old_variants, instance.image.storage)
+        if old_variants or instance.image_variants:
+            instance.image_variants = ''
+            Post.objects.filter(pk=instance.pk).update(image_variants='')
+        thumbnails.enqueue(instance.image)
+        variants.enqueue(instance)
+    bump_on_commit(*cache.post_scopes(
+        instance, getattr(instance, '_old_group_id', None)
+    ))
+
+
+def deleting_posts():
+    """Посты, которые удаляются в этом потоке вместе с комментариями.
+
+    Сигналы комментариев приходят уже после post_delete самого поста,
+    поэтому id убирается из набора после коммита удаления или когда
+    id снова занимает новый пост.
+    """
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """Варианты могли появиться в фоне уже после загрузки объекта."""
+    deleting_posts().add(instance.pk)
+    instance._old_variants = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('image_variants', flat=True).first()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: deleting_posts().discard(pk))
+    counters.bump(instance.author_id, posts_count=-1)
+    release_image(
+        instance.image.name,
+        getattr(instance, '_old_variants', instance.image_variants),
+        instance.image.storage
+    )
+    bump_on_commit(*cache.post_scopes(instance))
+
+
+# Счётчик комментариев показывается только на странице поста, поэтому
+# комментарий сбрасывает одну её, а не все ленты сайта.
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.post_id:
+        counters.bump_comments(instance.post_id, 1)
+        bump_on_commit(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # Пост удаляется целиком: его счётчик и страница уходят вместе с ним.
+    if instance.post_id and instance.post_id not in deleting_posts():
+        counters.bump_comments(instance.post_id, -1)
+        bump_on_commit(f'post:{instance.post_id}')
+
+
+def follow_scopes(follow):
+    # Счётчики подписок выводятся в профилях обоих пользователей.
+    return [
+        f'follow:{follow.user_id}',
+        f'profile:{follow.user_id}',
+        f'profile:{follow.author_id}',
+    ]
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    """Считает подписку и подтягивает посты автора в ленту."""
+    if created and not raw:
+        counters.bump(instance.author_id, followers_count=1)
+        counters.bump(instance.user_id, following_count=1)
+        timeline.follow(instance.user_id, instance.author_id)
+        bump_on_commit(*follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Считает отписку и убирает посты автора из ленты."""
+    counters.bump(instance.author_id, followers_count=-1)
+    counters.bump(instance.user_id, following_count=-1)
+    timeline.unfollow(instance.user_id, instance.author_id)
+    bump_on_commit(*follow_scopes(instance))
+
+
+@receiver(post_migrate)
+def search_repaired(sender, using, **kwargs):
+    """SQLite теряет триггеры поиска, когда миграция пересоздаёт таблицу."""
+    if sender.name == 'posts':
+        search.repair(connections[using])
@@ -0,0 +1,56 @@
+"""Хранилище картинок по содержимому.
+
+Файл сохраняется под sha256 своего содержимого, поэтому одинаковые
+загрузки занимают место на диске один раз, а миниатюры sorl-thumbnail и
+варианты из posts.variants нарезаются один раз на уникальную картинку.
+Ссылки постов на файлы считает posts.blobs.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+TEMP_SUFFIX = '.upload'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменяется хешем в _save, коллизий не бывает.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        # Хеш считается на лету, пока файл пишется во временный рядом с
+        # итоговым: переименование в пределах диска атомарно.
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=self.path(directory), suffix=TEMP_SUFFIX
+        )
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(descriptor, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            digest = digest.hexdigest()
+            name = posixpath.join(directory, digest[:2], digest + extension)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
@@ -0,0 +1,35 @@
+from django import template
+
+register = template.Library()
+
+# Колонка поста занимает три четверти контейнера на широких экранах.
+SIZES = '(min-width: 768px) 75vw, 100vw'
+FALLBACK_WIDTH = 960
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def responsive_image(post, sizes=SIZES):
+    """Картинка поста со srcset из манифеста вариантов."""
+    context = {'post': post, 'sizes': sizes}
+    variants = post.variants
+    if not variants:
+        return context
+    storage = post.image.storage
+
+    def srcset(name):
+        return ', '.join(
+            f'{storage.url(path)} {width}w'
+            for width, path in variants.get(name, [])
+        )
+
+    fallback = [
+        path for width, path in variants['jpeg'] if width <= FALLBACK_WIDTH
+    ]
+    context.update(
+        jpeg=srcset('jpeg'),
+        webp=srcset('webp'),
+        src=storage.url((fallback or [variants['jpeg'][0][1]])[-1]),
+        width=variants['width'],
+        height=variants['height'],
+    )
+    return context
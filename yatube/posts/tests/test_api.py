@@ -0,0 +1,179 @@
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..views import NUMBER_OF_COMMENTS, NUMBER_OF_POSTS
+from .utils import run_on_commit
+
+USERNAME = 'user_author'
+READER_USERNAME = 'user_reader'
+SLUG = 'text-slug'
+NUMBER_OF_POSTS_ALL = 25
+NUMBER_OF_COMMENTS_ALL = 30
+# Лента гостю: только выборка постов, без экземпляров моделей.
+FEED_QUERIES = 1
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.reader = User.objects.create_user(READER_USERNAME)
+        cls.group = Group.objects.create(
+            title='Группа', slug=SLUG, description='Описание'
+        )
+        for number in range(NUMBER_OF_POSTS_ALL):
+            cls.post = Post.objects.create(
+                text=f'Текст {number}',
+                author=cls.user_author,
+                group=cls.group if number % 2 else None,
+            )
+        Comment.objects.bulk_create([
+            Comment(
+                post=cls.post, author=cls.reader, text=f'Комментарий {number}'
+            )
+            for number in range(NUMBER_OF_COMMENTS_ALL)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, client, name, args=(), **params):
+        response = client.get(reverse(f'api_v1:{name}', args=args), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_feed_walks_all_posts_by_cursor(self):
+        """Курсор next проходит всю ленту без повторов и пропусков."""
+        ids = []
+        params = {}
+        while True:
+            data = self.get_json(self.guest_client, 'posts', **params)
+            self.assertLessEqual(len(data['results']), NUMBER_OF_POSTS)
+            ids += [post['id'] for post in data['results']]
+            if not data['next']:
+                break
+            params = {'after': data['next']}
+        self.assertEqual(ids, list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        ))
+
+    def test_sparse_fields(self):
+        """?fields= оставляет в ответе только перечисленные поля."""
+        data = self.get_json(self.guest_client, 'posts', fields='id,author')
+        self.assertEqual(
+            data['results'][0], {'id': self.post.pk, 'author': USERNAME}
+        )
+        response = self.guest_client.get(
+            reverse('api_v1:posts'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        # Счётчик комментариев есть только у отдельного поста.
+        response = self.guest_client.get(
+            reverse('api_v1:posts'), {'fields': 'id,comments_count'}
+        )
+        self.assertEqual(response.status_code, 400)
+        data = self.get_json(
+            self.guest_client, 'post', [self.post.pk],
+            fields='comments_count'
+        )
+        self.assertEqual(
+            data['post'], {'comments_count': self.post.comments_count}
+        )
+
+    def test_feed_queries_and_payload(self):
+        """Лента в JSON — один запрос и малая доля размера страницы."""
+        with self.assertNumQueries(FEED_QUERIES):
+            api = self.guest_client.get(reverse('api_v1:posts'))
+        html = self.guest_client.get(reverse('posts:index'))
+        self.assertLess(len(api.content), len(html.content) / 3)
+
+    def test_group_and_profile(self):
+        """Группа и автор отдаются вместе со своими лентами."""
+        data = self.get_json(self.guest_client, 'group', [SLUG])
+        self.assertEqual(data['group']['slug'], SLUG)
+        self.assertTrue(all(
+            post['group'] == SLUG for post in data['results']
+        ))
+        data = self.get_json(self.reader_client, 'profile', [USERNAME])
+        self.assertEqual(data['author']['posts_count'], NUMBER_OF_POSTS_ALL)
+        self.assertFalse(data['following'])
+        response = self.guest_client.get(
+            reverse('api_v1:group', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_with_comments(self):
+        """Пост отдаётся с первой порцией комментариев от старых к новым."""
+        data = self.get_json(self.guest_client, 'post', [self.post.pk])
+        self.assertEqual(data['post']['text'], self.post.text)
+        comments = data['comments']
+        self.assertEqual(len(comments['results']), NUMBER_OF_COMMENTS)
+        rest = self.get_json(
+            self.guest_client, 'comments', [self.post.pk],
+            after=comments['next']
+        )
+        self.assertEqual(
+            [comment['text'] for comment in
+             comments['results'] + rest['results']],
+            [f'Комментарий {number}'
+             for number in range(NUMBER_OF_COMMENTS_ALL)]
+        )
+
+    def test_etag_not_modified(self):
+        """Повторный запрос с ETag получает 304 без тела."""
+        url = reverse('api_v1:posts')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with run_on_commit():
+            Post.objects.create(text='Новый', author=self.user_author)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_comment(self):
+        """Комментарий добавляется из JSON, гостю — 401."""
+        url = reverse('api_v1:comments', args=[self.post.pk])
+        body = json.dumps({'text': 'Из приложения'})
+        response = self.guest_client.post(
+            url, body, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+        response = self.reader_client.post(
+            url, body, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content)['text'], 'Из приложения')
+        self.assertTrue(
+            Comment.objects.filter(text='Из приложения').exists()
+        )
+        response = self.reader_client.post(
+            url, json.dumps({'text': ''}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_follow_and_unfollow(self):
+        """POST подписывает, DELETE отписывает, на себя нельзя."""
+        url = reverse('api_v1:follow', args=[USERNAME])
+        self.assertEqual(self.reader_client.post(url).status_code, 201)
+        self.assertEqual(self.reader_client.post(url).status_code, 200)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.user_author
+        ).exists())
+        self.assertEqual(self.reader_client.delete(url).status_code, 200)
+        self.assertFalse(Follow.objects.exists())
+        response = self.reader_client.post(
+            reverse('api_v1:follow', args=[READER_USERNAME])
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.guest_client.post(url).status_code, 401)
+        self.assertEqual(self.reader_client.get(url).status_code, 405)
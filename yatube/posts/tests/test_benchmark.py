@@ -0,0 +1,110 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test import TestCase, override_settings
+
+from benchmarks import data, report, runner
+from core.queries import named_views
+
+from ..models import Follow, Post, TimelineEntry, User
+
+SCALE = {'users': 10, 'groups': 2, 'posts': 40, 'comments': 60}
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.created = data.generate(**SCALE)
+
+    def test_generate_keeps_counters(self):
+        """Сгенерированные счётчики совпадают с данными в базе."""
+        self.assertEqual(Post.objects.count(), SCALE['posts'])
+        self.assertEqual(Follow.objects.count(), self.created['follows'])
+        for post in Post.objects.annotate(total=Count('comments')):
+            self.assertEqual(post.comments_count, post.total)
+        for user in User.objects.annotate(
+            posts_total=Count('posts', distinct=True),
+            followers_total=Count('following', distinct=True),
+        ).select_related('stats'):
+            self.assertEqual(user.stats.posts_count, user.posts_total)
+            self.assertEqual(user.stats.followers_count, user.followers_total)
+
+    def test_targets_cover_posts_urls(self):
+        """Каждое представление posts отвечает без ошибок и считает запросы."""
+        pages = runner.targets()
+        self.assertEqual(
+            {name for name, _, _ in pages}, named_views('posts')
+        )
+        driver = runner.ClientDriver()
+        for name, url, user in pages:
+            with self.subTest(name=name, user=user):
+                status, queries = driver.get(user, url)
+                self.assertLess(status, 500)
+                self.assertIsNotNone(queries)
+
+    def test_compare_finds_regressions(self):
+        """Сравнение замечает рост p95, числа запросов и ошибки."""
+        baseline = report.summarize(
+            {'posts:index': [(0.010, 3, 200), (0.012, 3, 200)]}
+        )
+        same = report.summarize(
+            {'posts:index': [(0.011, 3, 200), (0.013, 3, 200)]}
+        )
+        worse = report.summarize(
+            {'posts:index': [(0.050, 4, 200), (0.060, 4, 500)]}
+        )
+        self.assertEqual(report.compare(same, baseline, 0.2), [])
+        self.assertEqual(len(report.compare(worse, baseline, 0.2)), 3)
+
+
+class Rollback(Exception):
+    pass
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedTest(TestCase):
+    def seed(self, seed):
+        """Запускает seed и откатывает его, возвращая снимок постов."""
+        out = StringIO()
+        try:
+            with transaction.atomic():
+                call_command(
+                    'seed', '--scale', 'tiny', '--posts', '60',
+                    '--comments', '90', '--seed', str(seed), '--images', '2',
+                    stdout=out,
+                )
+                snapshot = list(Post.objects.order_by(
+                    'pub_date', 'pk'
+                ).values_list('text', 'author__username', 'group__slug',
+                              'image', 'comments_count'))
+                self.assertFalse(TimelineEntry.objects.exists())
+                with self.assertRaises(CommandError):
+                    call_command('seed', '--scale', 'tiny', stdout=out)
+                raise Rollback
+        except Rollback:
+            pass
+        self.assertIn("'posts': 60", out.getvalue())
+        return snapshot
+
+    def test_seed_is_reproducible(self):
+        """Один seed даёт одну базу, другой seed — другую."""
+        first = self.seed(1)
+        self.assertEqual(len(first), 60)
+        self.assertTrue(any(image for _, _, _, image, _ in first))
+        self.assertEqual(sum(row[-1] for row in first), 90)
+        self.assertEqual(self.seed(1), first)
+        self.assertNotEqual(self.seed(2), first)
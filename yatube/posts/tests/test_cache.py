@@ -0,0 +1,76 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from .. import cache as feed_cache
+
+KEY = 'feed:test'
+VERSION = '1'
+NEW_VERSION = '2'
+THREADS = 8
+TIMEOUT = 60
+
+
+class GetOrComputeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def slow_compute(self, value):
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(0.2)
+            return value
+        return compute
+
+    def run_concurrently(self, version, value):
+        barrier = threading.Barrier(THREADS)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(feed_cache.get_or_compute(
+                KEY, version, self.slow_compute(value), TIMEOUT
+            ))
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cold_key_computed_once(self):
+        """Холодный ключ считается один раз, остальные ждут результат."""
+        results = self.run_concurrently(VERSION, 'fresh')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['fresh'] * THREADS)
+
+    def test_stale_value_served_during_refresh(self):
+        """Пока один поток пересчитывает, остальные получают старое."""
+        feed_cache.get_or_compute(KEY, VERSION, lambda: 'old', TIMEOUT)
+        results = self.run_concurrently(NEW_VERSION, 'new')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results.count('new'), 1)
+        self.assertEqual(results.count('old'), THREADS - 1)
+        self.assertEqual(
+            feed_cache.get_or_compute(KEY, NEW_VERSION, None, TIMEOUT), 'new'
+        )
+
+    def test_early_expiry(self):
+        """Близкий к истечению ключ иногда пересчитывается заранее."""
+        feed_cache.get_or_compute(KEY, VERSION, self.slow_compute(''), 1)
+        with mock.patch.object(feed_cache.random, 'random', return_value=0):
+            feed_cache.get_or_compute(KEY, VERSION, self.slow_compute(''), 1)
+        self.assertEqual(self.calls, 1)
+        # Выпал «хвост» распределения: пересчёт начинается раньше срока.
+        with mock.patch.object(
+            feed_cache.random, 'random', return_value=1 - 1e-9
+        ):
+            feed_cache.get_or_compute(KEY, VERSION, self.slow_compute(''), 1)
+        self.assertEqual(self.calls, 2)
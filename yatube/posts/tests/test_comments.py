@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+from ..views import NUMBER_OF_COMMENTS
+
+USERNAME = 'user_author'
+GROUP_NAME = 'Наименование группы'
+SLUG = 'text-slug'
+DESCRIPTION = 'Текстовое описание'
+TEXT = 'Тестовый текст'
+NUMBER_OF_COMMENTERS = 5
+NUMBER_OF_COMMENTS_ALL = 45
+# Автор поста для ETag, пост с автором, счётчиками и группой, комментарии.
+DETAIL_QUERIES = 3
+# Сессия и пользователь авторизованного клиента.
+AUTH_QUERIES = 2
+
+
+class PostCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_NAME,
+            slug=SLUG,
+            description=DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            text=TEXT,
+            author=cls.user_author,
+            group=cls.group
+        )
+        commenters = [
+            User.objects.create_user(f'commenter{number}')
+            for number in range(NUMBER_OF_COMMENTERS)
+        ]
+        Comment.objects.bulk_create([
+            Comment(
+                post=cls.post,
+                author=commenters[number % NUMBER_OF_COMMENTERS],
+                text=f'Комментарий {number}'
+            )
+            for number in range(NUMBER_OF_COMMENTS_ALL)
+        ])
+        cls.ordered = list(
+            Comment.objects.order_by('created', 'pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user_author)
+
+    def test_load_more_walks_all_comments(self):
+        """Первая порция на странице поста, остальные по «Показать ещё»."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        page = response.context['comment_page']
+        pks = [comment.pk for comment in page]
+        self.assertEqual(len(pks), NUMBER_OF_COMMENTS)
+        self.assertContains(response, 'data-load-more')
+        while page.has_next():
+            response = self.guest_client.get(
+                reverse('posts:post_comments', args=[self.post.id]),
+                {'after': page.next_cursor}
+            )
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            page = response.context['comment_page']
+            pks += [comment.pk for comment in page]
+        self.assertNotContains(response, 'data-load-more')
+        self.assertEqual(pks, self.ordered)
+
+    def test_detail_queries_bounded(self):
+        """Страница поста делает постоянное число запросов."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        cases = [
+            (self.guest_client, DETAIL_QUERIES),
+            (self.authorized_client, DETAIL_QUERIES + AUTH_QUERIES),
+        ]
+        for client, queries in cases:
+            with self.subTest(queries=queries):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,198 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import cache as feed_cache
+from ..models import Comment, Follow, Group, Post, User
+from .utils import run_on_commit
+
+USERNAME = 'user_author'
+ANOTHER_USERNAME = 'another_user'
+GROUP_NAME = 'Наименование группы'
+SLUG = 'text-slug'
+DESCRIPTION = 'Текстовое описание'
+TEXT = 'Тестовый текст'
+NEW_TEXT = 'Новый текст'
+# Сессия и пользователь авторизованного клиента.
+AUTH_QUERIES = 2
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.another_user = User.objects.create_user(ANOTHER_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_NAME,
+            slug=SLUG,
+            description=DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            text=TEXT,
+            author=cls.user_author,
+            group=cls.group
+        )
+        Follow.objects.create(user=cls.another_user, author=cls.user_author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.another_user)
+
+    def etag(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        return response['ETag']
+
+    def test_not_modified_without_page_queries(self):
+        """304 отдаётся без запроса ленты: только дешёвый поиск ключа."""
+        cases = [
+            (self.guest_client, reverse('posts:index'), 0),
+            (
+                self.guest_client,
+                reverse('posts:group_posts', args=[SLUG]), 1
+            ),
+            (self.guest_client, reverse('posts:profile', args=[USERNAME]), 1),
+            (
+                self.guest_client,
+                reverse('posts:post_detail', args=[self.post.id]), 1
+            ),
+            (
+                self.authorized_client,
+                reverse('posts:follow_index'), AUTH_QUERIES
+            ),
+            (
+                self.authorized_client,
+                reverse('posts:profile', args=[USERNAME]), AUTH_QUERIES + 1
+            ),
+        ]
+        for client, url, queries in cases:
+            with self.subTest(url=url):
+                etag = self.etag(client, url)
+                with self.assertNumQueries(queries):
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        """Без ETag страница проверяется по Last-Modified."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def feed_urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[SLUG]),
+            reverse('posts:profile', args=[USERNAME]),
+            reverse('posts:follow_index'),
+        ]
+
+    def statuses_after(self, change, urls):
+        etags = {url: self.etag(self.authorized_client, url) for url in urls}
+        with run_on_commit():
+            change()
+        return {
+            url: self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etags[url]
+            ).status_code
+            for url in urls
+        }
+
+    def test_changes_invalidate_etag(self):
+        """Правка поста меняет ETag всех страниц, где он показан."""
+        urls = [
+            *self.feed_urls(),
+            reverse('posts:post_detail', args=[self.post.id]),
+        ]
+        statuses = self.statuses_after(
+            lambda: Post.objects.filter(pk=self.post.pk).get().save(), urls
+        )
+        self.assertEqual(statuses, {url: 200 for url in urls})
+
+    def test_comment_invalidates_only_post(self):
+        """Комментарий меняет страницу поста, а ленты остаются в кеше."""
+        post_url = reverse('posts:post_detail', args=[self.post.id])
+        statuses = self.statuses_after(
+            lambda: Comment.objects.create(
+                post=self.post, author=self.another_user, text=NEW_TEXT
+            ),
+            [*self.feed_urls(), post_url],
+        )
+        self.assertEqual(statuses.pop(post_url), 200)
+        self.assertEqual(set(statuses.values()), {304})
+
+    def test_group_rename_invalidates_post(self):
+        """Новое название группы меняет ETag страницы её поста."""
+        urls = [
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('api_v1:post', args=[self.post.id]),
+        ]
+
+        def rename():
+            self.group.title = NEW_TEXT
+            self.group.slug = 'new-slug'
+            self.group.save()
+
+        self.assertEqual(
+            self.statuses_after(rename, urls), {url: 200 for url in urls}
+        )
+        self.assertContains(self.authorized_client.get(urls[0]), NEW_TEXT)
+        self.assertContains(self.authorized_client.get(urls[1]), 'new-slug')
+
+    def test_follow_invalidates_profile(self):
+        """Подписка меняет ETag профилей и ленты подписок."""
+        urls = [
+            reverse('posts:profile', args=[USERNAME]),
+            reverse('posts:profile', args=[ANOTHER_USERNAME]),
+            reverse('posts:follow_index'),
+        ]
+        etags = {url: self.etag(self.authorized_client, url) for url in urls}
+        with run_on_commit():
+            self.authorized_client.get(
+                reverse('posts:profile_unfollow', args=[USERNAME])
+            )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Гость и авторизованный пользователь получают разные ETag."""
+        url = reverse('posts:index')
+        self.assertNotEqual(
+            self.etag(self.guest_client, url),
+            self.etag(self.authorized_client, url)
+        )
+
+    def test_stale_page_has_no_validators(self):
+        """Старая страница во время чужого пересчёта уходит без ETag."""
+        url = reverse('posts:index')
+        self.etag(self.guest_client, url)
+        with run_on_commit():
+            Post.objects.create(text=NEW_TEXT, author=self.user_author)
+        add = cache.add
+
+        def locked(key, *args, **kwargs):
+            # Пересчёт ленты уже идёт в другом воркере.
+            return not key.endswith(':lock') and add(key, *args, **kwargs)
+
+        with mock.patch.object(feed_cache.cache, 'add', locked):
+            response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, NEW_TEXT)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.guest_client.get(url)
+        self.assertContains(response, NEW_TEXT)
+        self.assertTrue(response.has_header('ETag'))
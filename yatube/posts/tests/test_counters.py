@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User, UserStats
+
+USERNAME = 'user_author'
+ANOTHER_USERNAME = 'another_user'
+READER = 'reader'
+TEXT = 'Тестовый текст'
+COMMENT_TEXT = 'Текст комментария'
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.another_user = User.objects.create_user(ANOTHER_USERNAME)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.another_user)
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Создание и удаление поста меняют счётчик постов автора."""
+        self.author_client.post(reverse('posts:post_create'), {'text': TEXT})
+        self.assertEqual(self.stats(self.user_author).posts_count, 1)
+        Post.objects.get().delete()
+        self.assertEqual(self.stats(self.user_author).posts_count, 0)
+
+    def test_comment_counter(self):
+        """Комментарии считаются в самом посте."""
+        post = Post.objects.create(text=TEXT, author=self.user_author)
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[post.id]),
+            {'text': COMMENT_TEXT}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_post_delete_skips_comment_counters(self):
+        """Удаление поста не тратит запросы на каждый его комментарий."""
+        def delete_queries(comments):
+            post = Post.objects.create(text=TEXT, author=self.user_author)
+            Comment.objects.bulk_create([
+                Comment(post=post, author=self.another_user, text=TEXT)
+                for _ in range(comments)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        self.assertEqual(delete_queries(2), delete_queries(10))
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют оба счётчика подписок."""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[USERNAME])
+        )
+        self.assertEqual(self.stats(self.user_author).followers_count, 1)
+        self.assertEqual(self.stats(self.another_user).following_count, 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[USERNAME])
+        )
+        self.assertEqual(self.stats(self.user_author).followers_count, 0)
+        self.assertEqual(self.stats(self.another_user).following_count, 0)
+
+    def test_deleting_user_keeps_counters_consistent(self):
+        """Каскадное удаление пользователя не ломает чужие счётчики."""
+        reader = User.objects.create_user(READER)
+        Follow.objects.create(user=reader, author=self.user_author)
+        Post.objects.create(text=TEXT, author=reader)
+        reader.delete()
+        self.assertEqual(self.stats(self.user_author).followers_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount чинит разошедшиеся счётчики."""
+        post = Post.objects.create(text=TEXT, author=self.user_author)
+        Comment.objects.create(
+            post=post, author=self.user_author, text=COMMENT_TEXT
+        )
+        UserStats.objects.update(posts_count=42)
+        Post.objects.update(comments_count=0)
+        call_command('recount', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.user_author).posts_count, 1)
+        self.assertEqual(self.stats(self.another_user).posts_count, 0)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_profile_reads_counter(self):
+        """Профиль берёт число постов из счётчика, без COUNT(*)."""
+        Post.objects.create(text=TEXT, author=self.user_author)
+        UserStats.objects.filter(user=self.user_author).update(
+            posts_count=7
+        )
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=[USERNAME])
+        )
+        self.assertContains(response, 'Всего постов: 7')
@@ -0,0 +1,123 @@
+import csv
+import json
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import export
+from ..models import Comment, Follow, Group, Post, User
+
+USERNAME = 'user_author'
+STAFF_USERNAME = 'user_staff'
+START = datetime(2022, 1, 1, tzinfo=timezone.utc)
+NUMBER_OF_POSTS = 30
+WATERMARK = 20
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.staff = User.objects.create_user(STAFF_USERNAME, is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.bulk_create([
+            Post(text=f'Текст, "{number}"', author=cls.user_author,
+                 group=cls.group)
+            for number in range(NUMBER_OF_POSTS)
+        ])
+        # auto_now_add ставит одну дату на всю пачку: разводим их.
+        for number, pk in enumerate(
+            Post.objects.order_by('pk').values_list('pk', flat=True)
+        ):
+            Post.objects.filter(pk=pk).update(
+                pub_date=START + timedelta(minutes=number)
+            )
+        cls.post = Post.objects.order_by('pk').first()
+        Comment.objects.create(
+            post=cls.post, author=cls.staff, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.staff, author=cls.user_author)
+
+    def run_command(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('export_data', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_ndjson_incremental(self):
+        """since отдаёт только посты новее метки, по возрастанию даты."""
+        out, err = self.run_command('posts')
+        posts = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual(len(posts), NUMBER_OF_POSTS)
+        self.assertEqual(posts[0]['text'], 'Текст, "0"')
+        since = (START + timedelta(minutes=WATERMARK - 1)).isoformat()
+        self.assertIn(f'--since {posts[-1]["pub_date"][:16]}', err)
+        out, _ = self.run_command('posts', '--since', since)
+        self.assertEqual(
+            [json.loads(line)['text'] for line in out.splitlines()],
+            [f'Текст, "{number}"'
+             for number in range(WATERMARK, NUMBER_OF_POSTS)]
+        )
+
+    def test_csv(self):
+        """CSV с заголовком, экранированием и датами в ISO 8601."""
+        out, _ = self.run_command('comments', '--format', 'csv')
+        header, row = csv.reader(StringIO(out))
+        self.assertEqual(header, list(export.fields('comments')))
+        self.assertEqual(row[header.index('text')], 'Комментарий')
+        out, _ = self.run_command('posts', '--format', 'csv')
+        rows = list(csv.DictReader(StringIO(out)))
+        self.assertEqual(rows[0]['text'], 'Текст, "0"')
+        self.assertEqual(rows[0]['pub_date'], START.isoformat())
+
+    def test_since_needs_date_field(self):
+        """У подписок и групп нет даты для инкрементальной выгрузки."""
+        with self.assertRaises(export.ExportError):
+            export.rows('follows', export.parse_since('2022-01-01'))
+        with self.assertRaises(export.ExportError):
+            export.parse_since('вчера')
+
+    def test_endpoint_streams_for_staff(self):
+        """Выгрузка по HTTP идёт потоком и доступна только персоналу."""
+        url = reverse('api_v1:export', args=['follows'])
+        client = Client()
+        self.assertEqual(client.get(url).status_code, 401)
+        client.force_login(self.user_author)
+        self.assertEqual(client.get(url).status_code, 403)
+        client.force_login(self.staff)
+        response = client.get(url, {'format': 'csv'})
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(
+            b''.join(response.streaming_content).decode()
+        )))
+        self.assertEqual(rows[0]['author_id'], str(self.user_author.pk))
+        response = client.get(url, {'since': '2022-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_memory_does_not_grow_with_table(self):
+        """Память выгрузки не растёт с числом строк."""
+        def peak(count):
+            Post.objects.bulk_create([
+                Post(text='x' * 500, author=self.user_author)
+                for _ in range(count)
+            ])
+            tracemalloc.start()
+            for _ in export.format_lines(
+                'ndjson', 'posts', export.rows('posts', chunk_size=100)
+            ):
+                pass
+            _, result = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return result
+
+        small = peak(500)
+        large = peak(4500)
+        self.assertLess(large, small * 2)
@@ -0,0 +1,148 @@
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import cache as feed_cache
+from .. import feeds
+from ..models import Group, Post, User
+from .utils import run_on_commit
+
+USERNAME = 'user_author'
+ANOTHER_USERNAME = 'another_user'
+SLUG = 'text-slug'
+TEXT = 'Тестовый текст'
+NEW_TEXT = 'Новый текст'
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.another_user = User.objects.create_user(ANOTHER_USERNAME)
+        cls.group = Group.objects.create(
+            title='Группа', slug=SLUG, description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text=TEXT, author=cls.user_author, group=cls.group
+        )
+        Post.objects.create(text='Без группы', author=cls.another_user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def rss_titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/rss+xml'
+        ))
+        root = ElementTree.fromstring(response.content)
+        return [item.findtext('title') for item in root.iter('item')]
+
+    def test_feeds_filter_posts(self):
+        """Лента сайта, группы и автора показывает свои посты."""
+        self.assertEqual(
+            self.rss_titles(reverse('posts:index_rss')),
+            ['Без группы', TEXT]
+        )
+        self.assertEqual(
+            self.rss_titles(reverse('posts:group_rss', args=[SLUG])), [TEXT]
+        )
+        self.assertEqual(
+            self.rss_titles(reverse('posts:profile_rss', args=[USERNAME])),
+            [TEXT]
+        )
+        response = self.client.get(
+            reverse('posts:group_atom', args=[SLUG])
+        )
+        root = ElementTree.fromstring(response.content)
+        entry = root.find(f'{ATOM}entry')
+        self.assertEqual(entry.findtext(f'{ATOM}title'), TEXT)
+        self.assertTrue(entry.find(f'{ATOM}link').get('href').endswith(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ))
+        for url in (
+            reverse('posts:group_rss', args=['nothing']),
+            reverse('posts:profile_atom', args=['nobody']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_item_count_is_bounded(self):
+        """В ленте не больше NUMBER_OF_ITEMS последних постов."""
+        Post.objects.bulk_create([
+            Post(text=f'Пост {number}', author=self.user_author)
+            for number in range(feeds.NUMBER_OF_ITEMS)
+        ])
+        titles = self.rss_titles(reverse('posts:index_rss'))
+        self.assertEqual(len(titles), feeds.NUMBER_OF_ITEMS)
+
+    def test_not_modified_and_cached_body(self):
+        """304 и повтор тела из кеша обходятся без запросов к постам."""
+        url = reverse('posts:index_rss')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+        # ETag ленты не зависит от того, кто её читает.
+        self.client.force_login(self.another_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_invalidates_feeds(self):
+        """Правка поста меняет ETag и тело лент, где он показан."""
+        urls = [
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss', args=[SLUG]),
+            reverse('posts:profile_rss', args=[USERNAME]),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        self.post.text = NEW_TEXT
+        with run_on_commit():
+            self.post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(NEW_TEXT, response.content.decode())
+        # Пост другого автора вне группы ленту группы не трогает.
+        url = reverse('posts:group_rss', args=[SLUG])
+        etag = self.client.get(url)['ETag']
+        with run_on_commit():
+            Post.objects.create(text='Ещё пост', author=self.another_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_body_has_no_validators(self):
+        """Старое тело во время чужого пересчёта уходит без ETag."""
+        url = reverse('posts:index_rss')
+        self.client.get(url)
+        with run_on_commit():
+            Post.objects.create(text=NEW_TEXT, author=self.user_author)
+        add = cache.add
+
+        def locked(key, *args, **kwargs):
+            return not key.endswith(':lock') and add(key, *args, **kwargs)
+
+        with mock.patch.object(feed_cache.cache, 'add', locked):
+            response = self.client.get(url)
+        self.assertNotIn(NEW_TEXT, response.content.decode())
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.client.get(url)
+        self.assertIn(NEW_TEXT, response.content.decode())
+        self.assertTrue(response.has_header('ETag'))
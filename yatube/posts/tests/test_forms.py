@@ -1,5 +1,6 @@
 from http import HTTPStatus
 
+import hashlib
 import shutil
 import tempfile
 
@@ -27,6 +28,8 @@ SMALL_GIF = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+# Картинки хранятся под хешем содержимого.
+SMALL_GIF_NAME = hashlib.sha256(SMALL_GIF).hexdigest() + '.gif'
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -102,7 +105,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text=NEW_TEXT,
                 group=self.group.id,
-                image='posts/small.gif'
+                image__endswith=SMALL_GIF_NAME
             ).exists()
         )
 
@@ -135,7 +138,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text=CHANGE_TEXT,
                 group=self.group,
-                image='posts/big.gif'
+                image__endswith=SMALL_GIF_NAME
             ).exists()
         )
 
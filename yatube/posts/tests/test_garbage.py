@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .. import blobs, garbage
+from ..models import ImageBlob, Post, User
+
+USERNAME = 'user_author'
+TEXT = 'Тестовый текст'
+HOUR = 60 * 60
+REFERENCED = 'posts/aa/' + 'a' * 64 + '.gif'
+ORPHAN = 'posts/bb/' + 'b' * 64 + '.gif'
+FRESH_ORPHAN = 'posts/cc/' + 'c' * 64 + '.gif'
+LEGACY = 'posts/legacy.gif'
+UPLOAD = 'posts/tmpabc.upload'
+THUMBNAIL = 'cache/00/11/thumbnail.jpg'
+STRAY_THUMBNAIL = 'cache/22/33/stray.jpg'
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CollectMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.storage = Post._meta.get_field('image').storage
+        patcher = mock.patch.object(
+            blobs.transaction, 'on_commit', side_effect=lambda func: func()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in (REFERENCED, ORPHAN, LEGACY, UPLOAD):
+            self.write(self.storage, name, age=2 * HOUR)
+        self.write(self.storage, FRESH_ORPHAN)
+        Post.objects.bulk_create([
+            Post(text=TEXT, author=self.user_author, image=REFERENCED),
+            Post(text=TEXT, author=self.user_author, image=LEGACY),
+        ])
+        blobs.acquire(REFERENCED)
+
+    def write(self, storage, name, age=0):
+        path = storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as media_file:
+            media_file.write(b'GIF89a')
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+
+    def register(self, name, storage, source=None):
+        image = ImageFile(name, storage)
+        image.set_size((1, 1))
+        default.kvstore.set(image, source)
+        return image
+
+    def test_unreferenced_files_deleted(self):
+        """Удаляются старые файлы без ссылок и брошенные загрузки."""
+        report = garbage.collect()
+        self.assertEqual(report['originals'], 1)
+        self.assertEqual(report['uploads'], 1)
+        self.assertFalse(self.storage.exists(ORPHAN))
+        self.assertFalse(self.storage.exists(UPLOAD))
+        for name in (REFERENCED, LEGACY, FRESH_ORPHAN):
+            with self.subTest(name=name):
+                self.assertTrue(self.storage.exists(name))
+
+    def test_dead_kvstore_entries_deleted_with_thumbnails(self):
+        """Запись о картинке без ссылок уходит вместе с миниатюрами."""
+        source = self.register(ORPHAN, self.storage)
+        self.write(default.storage, THUMBNAIL, age=2 * HOUR)
+        thumbnail = self.register(THUMBNAIL, default.storage, source)
+        kept = self.register(REFERENCED, self.storage)
+        self.write(default.storage, STRAY_THUMBNAIL, age=2 * HOUR)
+        report = garbage.collect()
+        self.assertEqual(report['kvstore'], 2)
+        self.assertEqual(report['thumbnails'], 2)
+        self.assertIsNone(default.kvstore.get(source))
+        self.assertIsNone(default.kvstore.get(thumbnail))
+        self.assertIsNotNone(default.kvstore.get(kept))
+        self.assertFalse(default.storage.exists(THUMBNAIL))
+        self.assertFalse(default.storage.exists(STRAY_THUMBNAIL))
+
+    def test_dry_run_deletes_nothing(self):
+        """Сухой прогон только считает."""
+        out = StringIO()
+        call_command('collect_media', '--dry-run', stdout=out)
+        self.assertIn(ORPHAN, out.getvalue())
+        self.assertTrue(self.storage.exists(ORPHAN))
+        self.assertTrue(self.storage.exists(UPLOAD))
+        self.assertTrue(ImageBlob.objects.filter(name=REFERENCED).exists())
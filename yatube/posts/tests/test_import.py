@@ -0,0 +1,152 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import importer, search
+from ..models import Follow, Group, ImageBlob, Post, TimelineEntry, User
+
+USERNAME = 'user_author'
+READER_USERNAME = 'user_reader'
+SLUG = 'imported'
+IMAGE = 'posts/imported.jpg'
+NUMBER_OF_POSTS = 12
+PUB_DATE = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def lines(*records):
+    return [
+        record if isinstance(record, str) else json.dumps(
+            record, ensure_ascii=False
+        )
+        for record in records
+    ]
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(READER_USERNAME)
+
+    def records(self):
+        return lines(
+            {'type': 'user', 'username': USERNAME, 'first_name': 'Лев'},
+            {'type': 'group', 'slug': SLUG, 'title': 'Из выгрузки'},
+            *({
+                'type': 'post',
+                'author': USERNAME,
+                'group': SLUG if number % 2 else None,
+                'text': f'Импортированный пост {number}',
+                'pub_date': PUB_DATE.replace(minute=number).isoformat(),
+                'image': IMAGE if number < 2 else None,
+            } for number in range(NUMBER_OF_POSTS)),
+            {'type': 'follow', 'user': READER_USERNAME, 'author': USERNAME},
+            {'type': 'follow', 'user': USERNAME, 'author': USERNAME},
+            {'type': 'post', 'author': 'nobody', 'text': 'Без автора'},
+            {'type': 'comment', 'text': 'Не поддерживается'},
+            '{"type": "post", ',
+        )
+
+    def load(self, records, batch_size=5):
+        loader = importer.Importer(batch_size)
+        with search.deferred():
+            loader.load(records)
+            loader.flush()
+        loader.finish(enqueue_images=False)
+        return loader
+
+    def test_rows_and_skipped(self):
+        """Строки вставляются пачками, ошибочные считаются в skipped."""
+        loader = self.load(self.records())
+        self.assertEqual(loader.created, {
+            'user': 1, 'group': 1, 'post': NUMBER_OF_POSTS, 'follow': 1,
+        })
+        self.assertEqual(loader.skipped, {
+            'follow на себя': 1,
+            'post без автора': 1,
+            'неизвестный type': 1,
+            'не JSON': 1,
+        })
+        author = User.objects.get(username=USERNAME)
+        self.assertFalse(author.has_usable_password())
+        post = Post.objects.get(text='Импортированный пост 3')
+        self.assertEqual(post.author, author)
+        self.assertEqual(post.group.slug, SLUG)
+        self.assertEqual(post.pub_date, PUB_DATE.replace(minute=3))
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=author
+        ).exists())
+
+    def test_derived_data_rebuilt(self):
+        """Счётчики, ленты, поиск и ссылки на картинки как после сигналов."""
+        self.load(self.records())
+        author = User.objects.get(username=USERNAME)
+        self.assertEqual(author.stats.posts_count, NUMBER_OF_POSTS)
+        self.assertEqual(author.stats.followers_count, 1)
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.reader.stats.following_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(),
+            NUMBER_OF_POSTS
+        )
+        self.assertEqual(
+            ImageBlob.objects.get(name=IMAGE).refs, 2
+        )
+        found = search.filter_posts(Post.objects.all(), 'импортированный')
+        self.assertEqual(found.count(), NUMBER_OF_POSTS)
+        # Триггер вернулся: обычные посты индексируются как раньше.
+        Post.objects.create(text='Импортированный вручную', author=author)
+        found = search.filter_posts(Post.objects.all(), 'вручную')
+        self.assertEqual(found.count(), 1)
+
+    def test_passwords(self):
+        """Хеш пароля сохраняется, открытый пароль отбрасывает строку."""
+        loader = self.load(lines(
+            {'type': 'user', 'username': 'hashed',
+             'password': make_password('secret')},
+            {'type': 'user', 'username': 'plain', 'password': 'hunter2'},
+        ))
+        self.assertEqual(loader.created['user'], 1)
+        self.assertEqual(loader.skipped, {'user с неверным паролем': 1})
+        self.assertTrue(
+            User.objects.get(username='hashed').check_password('secret')
+        )
+        self.assertFalse(User.objects.filter(username='plain').exists())
+
+    def test_repeat_skips_existing(self):
+        """Повторная загрузка не дублирует пользователей и подписки."""
+        self.load(self.records())
+        loader = self.load(self.records())
+        self.assertEqual(loader.created['user'], 0)
+        self.assertEqual(loader.created['group'], 0)
+        self.assertEqual(loader.created['follow'], 0)
+        self.assertEqual(loader.skipped['user уже есть'], 1)
+        self.assertEqual(loader.skipped['follow уже есть'], 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Group.objects.filter(slug=SLUG).count(), 1)
+
+    def test_command(self):
+        """Команда читает файл и сообщает скорость и пропуски."""
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.ndjson', delete=False, encoding='utf-8'
+        ) as file:
+            file.write('\n'.join(self.records()))
+        self.addCleanup(os.remove, file.name)
+        out = StringIO()
+        call_command(
+            'import_content', file.name, '--no-thumbnails', stdout=out
+        )
+        self.assertIn(f'post: {NUMBER_OF_POSTS}', out.getvalue())
+        self.assertIn('пропущено, не JSON: 1', out.getvalue())
+        self.assertIn('строк/с без пересчёта', out.getvalue())
+        self.assertIn('строк/с с пересчётом', out.getvalue())
+        self.assertEqual(
+            Post.objects.filter(author__username=USERNAME).count(),
+            NUMBER_OF_POSTS
+        )
@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..paginator import (
+    MAX_PAGE_NUMBER, CursorPaginator, decode_cursor, encode_cursor
+)
+from .utils import capture_sql, query_plan
+
+USERNAME = 'user_author'
+NUMBER_OF_POSTS_ALL = 25
+NUMBER_OF_POSTS_PAGE = 10
+NUMBER_OF_POSTS_REMAINDER = 5
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        for num_post in range(NUMBER_OF_POSTS_ALL):
+            Post.objects.create(
+                text=f'Тестовый заголовок{num_post}',
+                author=cls.user_author,
+            )
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def get_page(self, **kwargs):
+        paginator = CursorPaginator(Post.objects.all(), NUMBER_OF_POSTS_PAGE)
+        return paginator.get_page(**kwargs)
+
+    def test_cursor_round_trip(self):
+        """Токен курсора однозначно декодируется обратно в ключ."""
+        post = self.ordered[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)), (post.pub_date, post.pk)
+        )
+        self.assertIsNone(decode_cursor('не-токен'))
+
+    def test_walk_forward_and_back(self):
+        """По курсорам after/before лента проходится без пропусков."""
+        first = self.get_page()
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.get_page(after=first.next_cursor)
+        third = self.get_page(after=second.next_cursor)
+        self.assertFalse(third.has_next())
+        self.assertEqual(
+            list(first) + list(second) + list(third), self.ordered
+        )
+        self.assertEqual(len(third), NUMBER_OF_POSTS_REMAINDER)
+        back = self.get_page(before=third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(
+            list(self.get_page(before=second.previous_cursor)), list(first)
+        )
+
+    def test_deep_page_single_query(self):
+        """Любая страница по курсору стоит один запрос без COUNT(*)."""
+        cursor = encode_cursor(self.ordered[-NUMBER_OF_POSTS_REMAINDER - 1])
+        with self.assertNumQueries(1):
+            page = self.get_page(after=cursor)
+            self.assertEqual(len(page), NUMBER_OF_POSTS_REMAINDER)
+
+    def test_deep_cursor_searches_index(self):
+        """Курсор в глубине ленты ищется по диапазону дат в индексе."""
+        cursors = {
+            'after': (r'pub_date<\?', encode_cursor(self.ordered[-2])),
+            'before': (r'pub_date>\?', encode_cursor(self.ordered[1])),
+        }
+        for direction, (bound, cursor) in cursors.items():
+            with self.subTest(direction=direction):
+                with capture_sql() as queries:
+                    self.get_page(**{direction: cursor})
+                plan = query_plan(*queries[0])
+                self.assertEqual(len(plan), 1)
+                self.assertRegex(plan[0], rf'^SEARCH .*\({bound}\)$')
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?after=%%%'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.ordered[:NUMBER_OF_POSTS_PAGE]
+        )
+
+    def test_legacy_page_number_is_capped(self):
+        """Огромный или слишком далёкий ?page= отдаёт первую страницу."""
+        first = self.ordered[:NUMBER_OF_POSTS_PAGE]
+        for number in ('99999999999999999999', MAX_PAGE_NUMBER + 1, -1):
+            with self.subTest(page=number):
+                response = self.guest_client.get(
+                    reverse('posts:index'), {'page': number}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context['page_obj']), first)
+        self.assertEqual(
+            list(self.get_page(number=2)),
+            self.ordered[NUMBER_OF_POSTS_PAGE:2 * NUMBER_OF_POSTS_PAGE]
+        )
+
+    def test_paginator_links_use_cursor(self):
+        """Ссылка «Следующая» ведёт на курсор, а не на номер страницы."""
+        response = self.guest_client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertContains(response, f'?after={page_obj.next_cursor}')
+        self.assertNotContains(response, '?page=')
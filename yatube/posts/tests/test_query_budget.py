@@ -0,0 +1,111 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.queries import QueryBudgetExceeded, named_views, query_budget
+
+from ..models import Comment, Follow, Group, Post, User
+
+USERNAME = 'user_author'
+READER_USERNAME = 'user_reader'
+SLUG = 'text-slug'
+NUMBER_OF_POSTS = 15
+NUMBER_OF_COMMENTERS = 5
+NUMBER_OF_COMMENTS = 25
+
+
+@query_budget()
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.reader = User.objects.create_user(READER_USERNAME)
+        cls.group = Group.objects.create(
+            title='Группа', slug=SLUG, description='Описание'
+        )
+        commenters = [
+            User.objects.create_user(f'commenter{number}')
+            for number in range(NUMBER_OF_COMMENTERS)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.user_author)
+        for number in range(NUMBER_OF_POSTS):
+            cls.post = Post.objects.create(
+                text=f'Текст {number}',
+                author=commenters[number % NUMBER_OF_COMMENTERS]
+                if number % 3 else cls.user_author,
+                group=cls.group if number % 2 else None,
+            )
+        cls.post = Post.objects.create(
+            text='Пост автора', author=cls.user_author, group=cls.group
+        )
+        for number in range(NUMBER_OF_COMMENTS):
+            Comment.objects.create(
+                post=cls.post,
+                author=commenters[number % NUMBER_OF_COMMENTERS],
+                text=f'Комментарий {number}',
+            )
+        post_args = [cls.post.pk]
+        cls.pages = {
+            'posts:index': [],
+            'posts:group_posts': [SLUG],
+            'posts:profile': [USERNAME],
+            'posts:index_rss': [],
+            'posts:index_atom': [],
+            'posts:group_rss': [SLUG],
+            'posts:group_atom': [SLUG],
+            'posts:profile_rss': [USERNAME],
+            'posts:profile_atom': [USERNAME],
+            'posts:post_detail': post_args,
+            'posts:post_comments': post_args,
+            'posts:search': [],
+            'posts:post_create': [],
+            'posts:post_edit': post_args,
+            'posts:add_comment': post_args,
+            'posts:follow_index': [],
+            'posts:profile_follow': [USERNAME],
+            'posts:profile_unfollow': [USERNAME],
+            'api_v1:posts': [],
+            'api_v1:post': post_args,
+            'api_v1:comments': post_args,
+            'api_v1:group': [SLUG],
+            'api_v1:profile': [USERNAME],
+            'api_v1:follow': [USERNAME],
+            'api_v1:export': ['posts'],
+            'users:signup': [],
+            'users:login': [],
+            'users:logout': [],
+            'users:password_reset_form': [],
+            'users:password_reset_done': [],
+            'users:password_reset_complete': [],
+            'users:password_change_form': [],
+            'users:password_change_done': [],
+            'users:password_reset_confirm': ['MQ', 'set-password'],
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def test_every_view_has_budget_check(self):
+        """Каждое представление posts, api_v1 и users проверяется ниже."""
+        self.assertEqual(
+            set(self.pages),
+            named_views('posts') | named_views('api_v1')
+            | named_views('users')
+        )
+
+    def test_views_within_budget(self):
+        """Ни одно представление не выходит за свой бюджет запросов."""
+        for name, args in self.pages.items():
+            for user in (None, self.user_author, self.reader):
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                with self.subTest(view=name, user=user):
+                    client.get(reverse(name, args=args), {'q': 'Текст'})
+
+    @query_budget({'posts:post_detail': 1})
+    def test_exceeded_budget_fails(self):
+        """Превышение бюджета роняет запрос с отчётом."""
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'post_detail'):
+            Client().get(reverse('posts:post_detail', args=[self.post.pk]))
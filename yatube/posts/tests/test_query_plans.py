@@ -0,0 +1,164 @@
+import re
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..paginator import encode_cursor
+from .utils import capture_sql, query_plan
+
+USERNAME = 'user_author'
+ANOTHER_USERNAME = 'another_user'
+GROUP_NAME = 'Наименование группы'
+SLUG = 'text-slug'
+DESCRIPTION = 'Текстовое описание'
+TEXT = 'Тестовый текст'
+DEEP_POSTS = 30
+PLANNED = ('SELECT', 'UPDATE', 'DELETE')
+# Любой SCAN, в том числе USING INDEX, читает таблицу или индекс с начала.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+# Исключение — первая страница без условий: голова индекса до LIMIT.
+INDEX_HEAD = re.compile(r'^SCAN \w+ USING (?:COVERING )?INDEX ')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Форма поста выводит список всех групп: полный проход по ним ожидаем.
+FORM_TABLES = {'posts_group'}
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.another_user = User.objects.create_user(ANOTHER_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_NAME,
+            slug=SLUG,
+            description=DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            text=TEXT,
+            author=cls.user_author,
+            group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.another_user, text=TEXT
+        )
+        Follow.objects.create(user=cls.another_user, author=cls.user_author)
+        # Курсоры из глубины ленты: у самого старого и самого нового поста.
+        Post.objects.bulk_create([
+            Post(text=TEXT, author=cls.user_author, group=cls.group)
+            for _ in range(DEEP_POSTS)
+        ])
+        posts = Post.objects.order_by('-pub_date', '-pk')
+        cls.oldest = encode_cursor(posts.last())
+        cls.newest = encode_cursor(posts.first())
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.another_user)
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+
+    def bad_plan_lines(self, sql, params, allowed_tables):
+        bad = []
+        head = ' WHERE ' not in sql and ' LIMIT ' in sql
+        for detail in query_plan(sql, params):
+            full_scan = FULL_SCAN.match(detail)
+            if head and INDEX_HEAD.match(detail):
+                continue
+            if full_scan and full_scan.group(1) not in allowed_tables:
+                bad.append(detail)
+            elif TEMP_SORT in detail:
+                bad.append(detail)
+        return bad
+
+    def assert_indexed(self, client, method, url, allowed_tables=()):
+        # Данные формы только для POST: у GET они заменили бы ?after=.
+        data = {'text': TEXT} if method == 'post' else None
+        # План строится с теми же параметрами, что у запроса: для
+        # подставленных литералов SQLite выбирает другой план.
+        with capture_sql() as queries:
+            getattr(client, method)(url, data)
+        for sql, params in queries:
+            if not sql.startswith(PLANNED):
+                continue
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(
+                    self.bad_plan_lines(sql, params, allowed_tables), []
+                )
+
+    def test_read_views_use_indexes(self):
+        """Ленты, страница поста и API читаются по индексам без сортировки."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[SLUG]),
+            reverse('posts:profile', args=[USERNAME]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:follow_index'),
+            reverse('api_v1:posts'),
+            reverse('api_v1:group', args=[SLUG]),
+            reverse('api_v1:profile', args=[USERNAME]),
+        ]
+        cursor = encode_cursor(self.post)
+        for url in urls:
+            self.assert_indexed(self.authorized_client, 'get', url)
+            self.assert_indexed(
+                self.authorized_client, 'get', f'{url}?after={cursor}'
+            )
+            self.assert_indexed(
+                self.authorized_client, 'get', f'{url}?before={cursor}'
+            )
+
+    def test_deep_cursor_uses_index(self):
+        """Курсор в глубине ленты ищется по диапазону, а не проходом."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[SLUG]),
+            reverse('posts:profile', args=[USERNAME]),
+            reverse('posts:follow_index'),
+            reverse('api_v1:posts'),
+            reverse('api_v1:group', args=[SLUG]),
+            reverse('api_v1:profile', args=[USERNAME]),
+        ]
+        for url in urls:
+            self.assert_indexed(
+                self.authorized_client, 'get', f'{url}?after={self.oldest}'
+            )
+            self.assert_indexed(
+                self.authorized_client, 'get', f'{url}?before={self.newest}'
+            )
+        comment = encode_cursor(self.post.comments.get(), 'created')
+        for url in (
+            reverse('posts:post_comments', args=[self.post.id]),
+            reverse('api_v1:comments', args=[self.post.id]),
+        ):
+            self.assert_indexed(
+                self.authorized_client, 'get', f'{url}?after={comment}'
+            )
+
+    def test_write_views_use_indexes(self):
+        """Пишущие представления находят строки по индексам."""
+        self.assert_indexed(
+            self.author_client, 'get', reverse('posts:post_create'),
+            FORM_TABLES
+        )
+        self.assert_indexed(
+            self.author_client, 'get',
+            reverse('posts:post_edit', args=[self.post.id]), FORM_TABLES
+        )
+        self.assert_indexed(
+            self.author_client, 'post', reverse('posts:post_create'),
+            FORM_TABLES
+        )
+        self.assert_indexed(
+            self.authorized_client, 'post',
+            reverse('posts:add_comment', args=[self.post.id])
+        )
+        self.assert_indexed(
+            self.authorized_client, 'get',
+            reverse('posts:profile_unfollow', args=[USERNAME])
+        )
+        self.assert_indexed(
+            self.authorized_client, 'get',
+            reverse('posts:profile_follow', args=[USERNAME])
+        )
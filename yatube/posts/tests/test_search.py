@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post, User
+
+USERNAME = 'user_author'
+ADMIN_USERNAME = 'admin'
+NUMBER_OF_POSTS_ALL = 12
+NUMBER_OF_POSTS_PAGE = 10
+
+
+def found(query, **kwargs):
+    paginator = search.SearchPaginator(query, NUMBER_OF_POSTS_PAGE)
+    return paginator.get_page(**kwargs)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.best = Post.objects.create(
+            text='Кошки, кошки и ещё раз кошки', author=cls.user_author
+        )
+        cls.other = Post.objects.create(
+            text='Про собак и одну кошку <b>жирно</b>',
+            author=cls.user_author
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_ranked_by_relevance(self):
+        """Пост, где слово чаще, выше; слова ищутся по префиксу."""
+        self.assertEqual(list(found('кошк')), [self.best, self.other])
+        self.assertEqual(list(found('собак')), [self.other])
+
+    def test_snippet_highlighted_and_escaped(self):
+        """Фрагмент подсвечивает слова и экранирует текст поста."""
+        post, = found('собак')
+        self.assertIn('<mark>собак</mark>', post.snippet)
+        self.assertIn('&lt;b&gt;', post.snippet)
+
+    def test_query_syntax_ignored(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        for query in ('"кошки', 'NEAR(кошки', '***', ''):
+            with self.subTest(query=query):
+                found(query)
+
+    def test_index_follows_changes(self):
+        """Триггеры обновляют индекс при правке, удалении и bulk_create."""
+        Post.objects.filter(pk=self.other.pk).update(text='Только попугаи')
+        self.assertEqual(list(found('собак')), [])
+        self.assertEqual(list(found('попугаи')), [self.other])
+        Post.objects.filter(pk=self.other.pk).delete()
+        self.assertEqual(list(found('попугаи')), [])
+        Post.objects.bulk_create(
+            [Post(text='Хомяки', author=self.user_author)]
+        )
+        self.assertEqual(len(found('хомяки')), 1)
+
+    def test_cursor_pagination(self):
+        """Выдача листается курсором без повторов и пропусков."""
+        Post.objects.bulk_create([
+            Post(text=f'Попугай номер {number}', author=self.user_author)
+            for number in range(NUMBER_OF_POSTS_ALL)
+        ])
+        first = found('попугай')
+        self.assertTrue(first.has_next())
+        second = found('попугай', after=first.next_cursor)
+        self.assertFalse(second.has_next())
+        posts = list(first) + list(second)
+        self.assertEqual(len(set(posts)), NUMBER_OF_POSTS_ALL)
+        self.assertEqual(
+            search.decode_cursor(search.encode_cursor(-1.5, 7)), (-1.5, 7)
+        )
+
+    def test_index_posts_command(self):
+        """Команда заполняет пустой индекс заново."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(list(found('кошк')), [])
+        call_command('index_posts', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(list(found('кошк')), [self.best, self.other])
+
+    def test_search_page(self):
+        """Страница поиска показывает фрагменты найденных постов."""
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'собак'}
+        )
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertContains(response, '<mark>собак</mark>')
+        self.assertEqual(list(response.context['page_obj']), [self.other])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по полнотекстовому индексу."""
+        admin = User.objects.create_superuser(ADMIN_USERNAME, '', 'pass')
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other]
+        )
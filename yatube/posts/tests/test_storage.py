@@ -0,0 +1,128 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import blobs
+from ..models import ImageBlob, Post, User
+
+USERNAME = 'user_author'
+TEXT = 'Тестовый текст'
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+DIGEST = hashlib.sha256(SMALL_GIF).hexdigest()
+CONTENT_NAME = f'posts/{DIGEST[:2]}/{DIGEST}.gif'
+VARIANTS = 'posts/variants'
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def uploaded(name):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.storage = Post._meta.get_field('image').storage
+        patcher = mock.patch.object(
+            blobs.transaction, 'on_commit', side_effect=lambda func: func()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, image):
+        return Post.objects.create(
+            text=TEXT, author=self.user_author, image=image
+        )
+
+    def files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), TEMP_MEDIA_ROOT)
+            for root, _, names in os.walk(self.storage.path('posts'))
+            for name in names
+            if not root.startswith(self.storage.path(VARIANTS))
+        )
+
+    def test_duplicates_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом под хешем."""
+        first = self.create_post(uploaded('haddaway.gif'))
+        second = self.create_post(uploaded('haddaway_copy.gif'))
+        self.assertEqual(first.image.name, CONTENT_NAME)
+        self.assertEqual(second.image.name, CONTENT_NAME)
+        self.assertEqual(self.files(), [CONTENT_NAME])
+        self.assertEqual(ImageBlob.objects.get(name=CONTENT_NAME).refs, 2)
+        # Варианты одинаковых картинок тоже совпадают: JPEG и WebP.
+        self.assertEqual(
+            sum(len(names) for _, _, names in os.walk(
+                self.storage.path(VARIANTS)
+            )), 2
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется, только когда на него не осталось ссылок."""
+        first = self.create_post(uploaded('first.gif'))
+        second = self.create_post(uploaded('second.gif'))
+        first.delete()
+        self.assertTrue(self.storage.exists(CONTENT_NAME))
+        self.assertEqual(ImageBlob.objects.get(name=CONTENT_NAME).refs, 1)
+        second.delete()
+        self.assertFalse(self.storage.exists(CONTENT_NAME))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_replaced_image_released(self):
+        """Замена картинки снимает ссылку со старой."""
+        post = self.create_post(uploaded('old.gif'))
+        post.image = ContentFile(b'GIF89a' + SMALL_GIF[6:] + b'!', 'new.gif')
+        post.save()
+        self.assertFalse(self.storage.exists(CONTENT_NAME))
+        self.assertFalse(ImageBlob.objects.filter(name=CONTENT_NAME).exists())
+        self.assertEqual(ImageBlob.objects.get(name=post.image.name).refs, 1)
+
+    def test_dedupe_legacy_images(self):
+        """Команда переносит старые имена под хеш и склеивает дубли."""
+        legacy = ['posts/haddaway.gif', 'posts/haddaway_HLvpfdw.gif']
+        os.makedirs(self.storage.path('posts'))
+        for name in legacy:
+            # Старые файлы лежали под исходными именами, минуя хеш.
+            with open(self.storage.path(name), 'wb') as legacy_file:
+                legacy_file.write(SMALL_GIF)
+            Post.objects.bulk_create(
+                [Post(text=TEXT, author=self.user_author, image=name)]
+            )
+        call_command('dedupe_images', stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by().values_list(
+                'image', flat=True
+            ).distinct()),
+            [CONTENT_NAME]
+        )
+        self.assertEqual(self.files(), [CONTENT_NAME])
+        self.assertEqual(ImageBlob.objects.get(name=CONTENT_NAME).refs, 2)
@@ -0,0 +1,137 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail.base import ThumbnailBackend
+
+from .. import thumbnails
+from ..models import Post, User
+
+USERNAME = 'user_author'
+TEXT = 'Тестовый текст'
+NUMBER_OF_POSTS = 10
+PLACEHOLDER = 'img/placeholder.svg'
+SIZE = (960, 339)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def uploaded(name, color=0):
+    # Одинаковые картинки хранятся одним файлом, поэтому цвет разный.
+    buffer = BytesIO()
+    Image.new('RGB', SIZE, (color, 0, 0)).save(buffer, 'GIF')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/gif'
+    )
+
+
+def fake_create(backend, source_image, geometry_string, options, thumbnail):
+    thumbnail.set_size(SIZE)
+
+
+class QueueExecutor:
+    """Копит задачи пула, чтобы тест выполнил их сам."""
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, func, *args):
+        self.jobs.append((func, args))
+
+    def count(self, func):
+        return sum(job is func for job, _ in self.jobs)
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for func, args in jobs:
+            func(*args)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._pending.clear()
+        self.executor = QueueExecutor()
+        # Сама нарезка Pillow здесь не проверяется: тест следит за очередью.
+        self.create = mock.patch.object(
+            ThumbnailBackend, '_create_thumbnail', autospec=True,
+            side_effect=fake_create
+        ).start()
+        mock.patch.object(
+            thumbnails, '_executor', return_value=self.executor
+        ).start()
+        mock.patch.object(
+            thumbnails.transaction, 'on_commit',
+            side_effect=lambda func: func()
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+
+    def test_cold_page_renders_without_processing(self):
+        """Свежие картинки не нарезаются в запросе: выводится заглушка."""
+        for number in range(NUMBER_OF_POSTS):
+            Post.objects.create(
+                text=TEXT, author=self.user_author,
+                image=uploaded(f'cold{number}.gif', number)
+            )
+        response = self.client.get(reverse('posts:index'))
+        self.create.assert_not_called()
+        self.assertContains(response, PLACEHOLDER, count=NUMBER_OF_POSTS)
+        # Промахи не дублируют задачи, поставленные при загрузке.
+        self.assertEqual(
+            self.executor.count(thumbnails._generate),
+            NUMBER_OF_POSTS * len(thumbnails.GEOMETRIES)
+        )
+
+        self.executor.run()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, 'cache/', count=NUMBER_OF_POSTS)
+
+    def test_upload_enqueues_every_geometry(self):
+        """Загрузка ставит в очередь все размеры из шаблонов."""
+        self.author_client.post(
+            reverse('posts:post_create'),
+            {'text': TEXT, 'image': uploaded('upload.gif')}
+        )
+        self.assertEqual(
+            self.executor.count(thumbnails._generate),
+            len(thumbnails.GEOMETRIES)
+        )
+        self.executor.run()
+        self.create.reset_mock()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[Post.objects.get().pk])
+        )
+        self.create.assert_not_called()
+        self.assertNotContains(response, PLACEHOLDER)
+
+    def test_duplicate_requests_queued_once(self):
+        """Повторные промахи по той же миниатюре не дублируют задачу."""
+        Post.objects.create(
+            text=TEXT, author=self.user_author, image=uploaded('dup.gif')
+        )
+        self.executor.jobs.clear()
+        thumbnails._pending.clear()
+        self.client.get(reverse('posts:index'))
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.executor.count(thumbnails._generate), 1)
@@ -0,0 +1,123 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+from .utils import run_on_commit
+
+USERNAME = 'user_author'
+FOLLOWER = 'follower'
+ANOTHER_FOLLOWER = 'another_follower'
+TEXT = 'Тестовый текст'
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+        cls.follower = User.objects.create_user(FOLLOWER)
+        cls.another_follower = User.objects.create_user(ANOTHER_FOLLOWER)
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def get_feed(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост попадает в ленты всех подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.user_author)
+        Follow.objects.create(
+            user=self.another_follower, author=self.user_author
+        )
+        post = Post.objects.create(text=TEXT, author=self.user_author)
+        self.assertTrue(post.in_timelines)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=post).count(), 2
+        )
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_follow_and_unfollow_update_timeline(self):
+        """Подписка подтягивает старые посты, отписка их убирает."""
+        post = Post.objects.create(text=TEXT, author=self.user_author)
+        with run_on_commit():
+            self.follower_client.get(
+                reverse('posts:profile_follow', args=[USERNAME])
+            )
+        self.assertEqual(self.get_feed(), [post])
+        with run_on_commit():
+            self.follower_client.get(
+                reverse('posts:profile_unfollow', args=[USERNAME])
+            )
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_is_pulled(self):
+        """Посты популярного автора подмешиваются при чтении ленты."""
+        Follow.objects.create(user=self.follower, author=self.user_author)
+        Follow.objects.create(
+            user=self.another_follower, author=self.user_author
+        )
+        pulled = Post.objects.create(text=TEXT, author=self.user_author)
+        self.assertFalse(pulled.in_timelines)
+        self.assertFalse(TimelineEntry.objects.exists())
+        with run_on_commit():
+            Follow.objects.create(
+                user=self.follower, author=self.another_follower
+            )
+            pushed = Post.objects.create(
+                text=TEXT, author=self.another_follower
+            )
+        self.assertEqual(self.get_feed(), [pushed, pulled])
+
+    def test_rebuild_timelines(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        post = Post.objects.create(text=TEXT, author=self.user_author)
+        Follow.objects.create(user=self.follower, author=self.user_author)
+        TimelineEntry.objects.all().delete()
+        Post.objects.update(in_timelines=False)
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower, post=post
+            ).exists()
+        )
+        self.assertEqual(self.get_feed(), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_bulk_rebuild(self):
+        """bulk_rebuild собирает ленты как по одному автору, с лимитом."""
+        Follow.objects.bulk_create([
+            Follow(user=self.follower, author=self.user_author),
+            Follow(user=self.another_follower, author=self.user_author),
+            Follow(user=self.follower, author=self.another_follower),
+        ])
+        popular = Post.objects.create(text=TEXT, author=self.user_author)
+        pushed = Post.objects.create(text=TEXT, author=self.another_follower)
+        TimelineEntry.objects.all().delete()
+        # Устаревшая строка ленты и флаг рассылки сбрасываются.
+        TimelineEntry.objects.create(
+            user=self.another_follower, post=popular,
+            author=self.user_author, pub_date=popular.pub_date
+        )
+        Post.objects.update(in_timelines=True)
+        rebuilt = timeline.bulk_rebuild(
+            [self.user_author.pk, self.another_follower.pk]
+        )
+        self.assertEqual(rebuilt, 1)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.follower.pk, pushed.pk)]
+        )
+        popular.refresh_from_db()
+        self.assertFalse(popular.in_timelines)
+        self.assertEqual(self.get_feed(), [pushed, popular])
@@ -0,0 +1,103 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import variants
+from ..models import Post, User
+
+USERNAME = 'user_author'
+TEXT = 'Тестовый текст'
+WIDE = (1000, 500)
+SMALL = (200, 100)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def uploaded(name, size):
+    buffer = BytesIO()
+    Image.new('RGBA', size, (255, 0, 0, 128)).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class VariantsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_manifest_widths_and_formats(self):
+        """Варианты не шире оригинала, в JPEG и WebP."""
+        post = Post.objects.create(
+            text=TEXT, author=self.user_author,
+            image=uploaded('wide.png', WIDE)
+        )
+        manifest = variants.build(post.pk)
+        self.assertEqual(
+            (manifest['width'], manifest['height']), WIDE
+        )
+        for name, image_format in (('jpeg', 'JPEG'), ('webp', 'WEBP')):
+            with self.subTest(format=name):
+                widths = [width for width, _ in manifest[name]]
+                self.assertEqual(widths, [320, 640, 960, 1000])
+                width, path = manifest[name][0]
+                with Image.open(post.image.storage.path(path)) as image:
+                    self.assertEqual(image.format, image_format)
+                    self.assertEqual(image.size, (width, width // 2))
+        post.refresh_from_db()
+        self.assertEqual(post.variants, manifest)
+
+    def test_small_image_is_not_upscaled(self):
+        """Маленькая картинка даёт один вариант своей ширины."""
+        post = Post.objects.create(
+            text=TEXT, author=self.user_author,
+            image=uploaded('small.png', SMALL)
+        )
+        manifest = variants.build(post.pk)
+        self.assertEqual([width for width, _ in manifest['jpeg']], [200])
+
+    def test_post_detail_serves_srcset(self):
+        """Страница поста отдаёт srcset с ленивой загрузкой, а не оригинал."""
+        post = Post.objects.create(
+            text=TEXT, author=self.user_author,
+            image=uploaded('detail.png', WIDE)
+        )
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.client.get(url)
+        variants.build(post.pk)
+        response = self.client.get(url)
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'srcset=', count=2)
+        self.assertContains(response, '.jpeg 960w')
+        self.assertNotContains(response, f'src="{post.image.url}"')
+
+    def test_new_image_resets_manifest(self):
+        """Смена картинки сбрасывает манифест старой."""
+        post = Post.objects.create(
+            text=TEXT, author=self.user_author,
+            image=uploaded('old.png', SMALL)
+        )
+        variants.build(post.pk)
+        post.refresh_from_db()
+        post.image = uploaded('new.png', WIDE)
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.variants, {})
@@ -1,14 +1,19 @@
+import json
+import os
 import shutil
+import subprocess
+import sys
 import tempfile
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import Client, SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 
 from ..models import Follow, Group, Post, User
+from .utils import run_on_commit
 
 USERNAME = 'user_author'
 ANOTHER_USERNAME = 'another_user'
@@ -34,6 +39,36 @@ SMALL_GIF = (
 )
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Второе соединение читает ленту, пока пост записан, но не закоммичен.
+COMMIT_SCRIPT = """
+import json
+import threading
+from django.db import connection, transaction
+from django.test import Client
+from posts.models import Post, User
+
+author = User.objects.create_user('author')
+client = Client()
+client.get('/')
+result = {}
+
+
+def read(client, result, connection):
+    response = client.get('/')
+    result['before_commit'] = 'Новый пост' in response.content.decode()
+    connection.close()
+
+
+with transaction.atomic():
+    Post.objects.create(author=author, text='Новый пост')
+    thread = threading.Thread(
+        target=read, args=(client, result, connection)
+    )
+    thread.start()
+    thread.join()
+result['after_commit'] = 'Новый пост' in client.get('/').content.decode()
+print(json.dumps(result))
+"""
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -279,7 +314,8 @@ class CacheViewsTest(TestCase):
         )
         response_one = self.guest_client.get(reverse('posts:index'))
         post_content = response_one.content
-        cache_post.delete()
+        # Изменение в обход сигналов не сбрасывает кеш фрагмента.
+        Post.objects.filter(pk=cache_post.pk).update(text=NEW_HEADER)
         responce_two = self.guest_client.get(reverse('posts:index'))
         post_content_two = responce_two.content
         self.assertEqual(post_content, post_content_two)
@@ -288,6 +324,32 @@ class CacheViewsTest(TestCase):
         post_content_three = response_one.content
         self.assertNotEquals(post_content, post_content_three)
 
+    def test_cache_invalidated_on_delete(self):
+        """Удалённый пост сразу пропадает из закешированной ленты."""
+        cache_post = Post.objects.create(
+            text=CACHE_TEXT,
+            author=self.user_author,
+            group=self.group
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, CACHE_TEXT)
+        with run_on_commit():
+            cache_post.delete()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, CACHE_TEXT)
+
+    def test_follow_cache_is_per_user(self):
+        """Закешированная лента подписок не отдаётся чужому пользователю."""
+        reader = Client()
+        reader.force_login(self.another_user)
+        Follow.objects.create(user=self.another_user, author=self.user_author)
+        response = reader.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Тестовый заголовок')
+        author = Client()
+        author.force_login(self.user_author)
+        response = author.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Тестовый заголовок')
+
 
 class PaginatorViewsTest(TestCase):
     # Здесь создаются фикстуры: клиент и 13 тестовых записей.
@@ -407,3 +469,27 @@ class FollowViewsTest(TestCase):
         cache.clear()
         count_two = len(Post.objects.filter(author__following__user=user))
         self.assertNotEquals(count_one, count_two)
+
+
+class CommitVisibilityTest(SimpleTestCase):
+    def test_feed_read_before_commit_is_not_kept(self):
+        """Лента, собранная до коммита поста, не живёт под новой версией."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        env = dict(
+            os.environ,
+            DB_NAME=os.path.join(directory, 'db.sqlite3'),
+            MEDIA_ROOT=os.path.join(directory, 'media'),
+        )
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '-v', '0'],
+            cwd=settings.BASE_DIR, env=env, check=True,
+        )
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c', COMMIT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, check=True,
+            stdout=subprocess.PIPE,
+        )
+        result = json.loads(result.stdout)
+        self.assertFalse(result['before_commit'])
+        self.assertTrue(result['after_commit'])
@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def run_on_commit(using=DEFAULT_DB_ALIAS):
+    """Выполняет on_commit, отложенные в блоке: TestCase не коммитит.
+
+    Как captureOnCommitCallbacks(execute=True) из Django 3.2.
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
+
+
+@contextmanager
+def capture_sql(using=DEFAULT_DB_ALIAS):
+    """Собирает пары (sql, params) выполненных запросов.
+
+    CaptureQueriesContext подставляет параметры литералами, а с
+    литералами SQLite строит другой план, чем для запроса из кода.
+    """
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        if not many:
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(record):
+        yield queries
+
+
+def query_plan(sql, params=(), using=DEFAULT_DB_ALIAS):
+    """Строки EXPLAIN QUERY PLAN запроса с теми же параметрами."""
+    with connections[using].cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
@@ -0,0 +1,159 @@
+"""Нарезка миниатюр в фоновом пуле потоков.
+
+Шаблоны получают миниатюры тегом {% thumbnail %} из sorl-thumbnail. Бэкенд
+QueuedThumbnailBackend в запросе только ищет готовую миниатюру в
+хранилище ключей, а если её нет, ставит нарезку в очередь и отдаёт
+заглушку: шаблон выводит её в блоке {% empty %}. Загруженные картинки
+нарезаются заранее во всех размерах из GEOMETRIES.
+
+Когда готова миниатюра, вместо которой кто-то уже видел заглушку,
+увеличивается версия MEDIA_SCOPE, и кеш лент и ETag страниц сбрасываются.
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from core.telemetry import timed
+
+from . import cache
+
+# Размеры и опции должны совпадать с тегами {% thumbnail %} в шаблонах.
+GEOMETRIES = (
+    ('960x339', {'upscale': True}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+# Задачи в очереди: ключ -> видел ли кто-то заглушку вместо миниатюры.
+_pending = {}
+_lock = threading.Lock()
+
+
+class QueuedThumbnailBackend(ThumbnailBackend):
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        with timed('thumbnail'):
+            thumbnail = self._cached(source, geometry_string, options)
+        if thumbnail:
+            return thumbnail
+        transaction.on_commit(lambda: _submit(
+            source, [(geometry_string, options)], served=True
+        ))
+        return DummyImageFile(geometry_string)
+
+    def generate(self, file_, geometry_string, **options):
+        """Нарезает миниатюру, если её ещё нет."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+    def _cached(self, source, geometry_string, options):
+        # Те же опции по умолчанию, что и в ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт.
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+class _Pool(ThreadPoolExecutor):
+    def submit(self, func, *args):
+        return super().submit(_run_in_pool, func, *args)
+
+
+class _Inline:
+    """Выполняет задачу сразу в текущем потоке (THUMBNAIL_WORKERS = 0)."""
+    def submit(self, func, *args):
+        future = Future()
+        with timed('thumbnail'):
+            future.set_result(_run(func, *args))
+        return future
+
+
+def _executor():
+    global _pool
+    with _lock:
+        if _pool is None:
+            workers = settings.THUMBNAIL_WORKERS
+            _pool = _Pool(
+                workers, thread_name_prefix='thumbnails'
+            ) if workers else _Inline()
+        return _pool
+
+
+def _submit(source, geometries, served=False):
+    futures = []
+    for geometry, options in geometries:
+        key = (source.name, geometry, tuple(sorted(options.items())))
+        with _lock:
+            queued = key in _pending
+            _pending[key] = _pending.get(key, False) or served
+        if not queued:
+            futures.append(
+                submit(_generate, key, source, geometry, options)
+            )
+    return futures
+
+
+def _generate(key, source, geometry, options):
+    try:
+        default.backend.generate(source, geometry, **options)
+    finally:
+        with _lock:
+            served = _pending.pop(key, False)
+        if served:
+            cache.bump(cache.MEDIA_SCOPE)
+
+
+def _run(func, *args):
+    try:
+        return func(*args)
+    except Exception:
+        logger.exception('Обработка картинки не удалась')
+
+
+def _run_in_pool(func, *args):
+    try:
+        return _run(func, *args)
+    finally:
+        # Поток пула живёт долго: соединение с БД не должно висеть.
+        connection.close()
+
+
+def submit(func, *args):
+    """Выполняет функцию в фоновом пуле обработки картинок."""
+    return _executor().submit(func, *args)
+
+
+def enqueue(image, geometries=GEOMETRIES):
+    """Ставит нарезку миниатюр картинки в очередь после коммита."""
+    if image:
+        source = ImageFile(image)
+        transaction.on_commit(lambda: _submit(source, geometries))
+
+
+def generate(images, geometries=GEOMETRIES):
+    """Нарезает миниатюры картинок в пуле и ждёт окончания."""
+    futures = []
+    for image in images:
+        futures += _submit(ImageFile(image), geometries)
+    for future in futures:
+        future.result()
+    return len(futures)
@@ -0,0 +1,203 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации id поста раскладывается в TimelineEntry каждого
+подписчика, и лента /follow/ читается диапазоном по индексу
+(user, pub_date, post). Посты авторов, у которых подписчиков больше
+TIMELINE_FANOUT_LIMIT, не рассылаются: они остаются с
+in_timelines=False и подмешиваются в ленту при чтении.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.sqlite import deferred_indexes
+
+from .models import Follow, Post, TimelineEntry
+from .paginator import CursorPaginator, seek
+
+BATCH_SIZE = 500
+# Лента подписчиков автора одним запросом, без экземпляров моделей.
+REBUILD_SQL = (
+    'INSERT INTO posts_timelineentry (user_id, post_id, author_id, pub_date) '
+    'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+    'FROM posts_post post '
+    'JOIN posts_follow follow ON follow.author_id = post.author_id '
+    'WHERE post.author_id = %s'
+)
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post, followers=None):
+    """Раскладывает пост по лентам подписчиков автора.
+
+    Возвращает False, если подписчиков слишком много и пост будет
+    читаться из общей таблицы постов.
+    """
+    if followers is None:
+        followers = list(
+            Follow.objects.filter(author_id=post.author_id)
+            .values_list('user_id', flat=True)
+        )
+    if len(followers) > settings.TIMELINE_FANOUT_LIMIT:
+        return False
+    with transaction.atomic():
+        _bulk_insert(
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date
+            )
+            for user_id in followers
+        )
+        Post.objects.filter(pk=post.pk).update(in_timelines=True)
+    post.in_timelines = True
+    return True
+
+
+def follow(user_id, author_id):
+    """Добавляет в ленту подписчика уже разосланные посты автора."""
+    # Флаг фильтруется здесь, чтобы запрос шёл по индексу автора.
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date', 'in_timelines'
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=pk,
+            author_id=author_id,
+            pub_date=pub_date
+        )
+        for pk, pub_date, in_timelines in posts.iterator()
+        if in_timelines
+    )
+
+
+def unfollow(user_id, author_id):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+
+
+def rebuild(authors=None):
+    """Пересобирает ленты с нуля, по одному автору за раз.
+
+    Возвращает число разосланных постов.
+    """
+    posts = Post.objects.all()
+    if authors is not None:
+        posts = posts.filter(author__in=authors)
+    author_ids = posts.order_by().values_list(
+        'author_id', flat=True
+    ).distinct()
+    rebuilt = 0
+    for author_id in author_ids.iterator():
+        followers = Follow.objects.filter(author_id=author_id).count()
+        author_posts = Post.objects.filter(author_id=author_id)
+        with transaction.atomic():
+            TimelineEntry.objects.filter(author_id=author_id).delete()
+            if followers > settings.TIMELINE_FANOUT_LIMIT:
+                author_posts.update(in_timelines=False)
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(REBUILD_SQL, [author_id])
+            rebuilt += author_posts.update(in_timelines=True)
+    return rebuilt
+
+
+# Временная таблица bulk_rebuild: id автора и рассылать ли его посты.
+BULK_AUTHORS = 'timeline_bulk_authors'
+
+
+def bulk_rebuild(authors):
+    """Пересобирает ленты авторов разом, для массовой загрузки.
+
+    В отличие от rebuild не ходит по авторам: id кладутся во временную
+    таблицу, и ленты всех авторов удаляются и собираются заново одним
+    INSERT ... SELECT по подпискам и постам. Неуникальные индексы лент
+    на это время сняты (core.sqlite.deferred_indexes). Всё идёт одной
+    транзакцией, поэтому на живом сайте уместнее rebuild. Возвращает
+    число разосланных постов.
+    """
+    selected = f'SELECT id FROM {BULK_AUTHORS}'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE {BULK_AUTHORS} '
+            '(id integer PRIMARY KEY, fan_out bool NOT NULL DEFAULT 0)'
+        )
+        cursor.executemany(
+            f'INSERT INTO {BULK_AUTHORS} (id) VALUES (%s)',
+            [(pk,) for pk in set(authors)]
+        )
+        cursor.execute(
+            f'UPDATE {BULK_AUTHORS} SET fan_out = (SELECT COUNT(*) '
+            'FROM posts_follow '
+            f'WHERE posts_follow.author_id = {BULK_AUTHORS}.id) <= %s',
+            [settings.TIMELINE_FANOUT_LIMIT]
+        )
+        with deferred_indexes(TimelineEntry._meta.db_table):
+            cursor.execute(
+                f'DELETE FROM posts_timelineentry WHERE author_id IN '
+                f'({selected})'
+            )
+            cursor.execute(
+                'INSERT INTO posts_timelineentry '
+                '(user_id, post_id, author_id, pub_date) '
+                'SELECT follow.user_id, post.id, post.author_id, '
+                'post.pub_date '
+                f'FROM {BULK_AUTHORS} author '
+                'JOIN posts_post post ON post.author_id = author.id '
+                'JOIN posts_follow follow ON follow.author_id = author.id '
+                'WHERE author.fan_out'
+            )
+        cursor.execute(
+            'UPDATE posts_post SET in_timelines = 0 WHERE in_timelines '
+            f'AND author_id IN ({selected} WHERE NOT fan_out)'
+        )
+        cursor.execute(
+            'UPDATE posts_post SET in_timelines = 1 WHERE NOT in_timelines '
+            f'AND author_id IN ({selected} WHERE fan_out)'
+        )
+        cursor.execute(
+            'SELECT COUNT(*) FROM posts_post '
+            f'WHERE author_id IN ({selected} WHERE fan_out)'
+        )
+        rebuilt = cursor.fetchone()[0]
+        cursor.execute(f'DROP TABLE {BULK_AUTHORS}')
+    return rebuilt
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная пагинация ленты подписок: разосланное плюс подмешанное."""
+
+    def __init__(self, user, per_page, **kwargs):
+        self.user = user
+        pulled = Post.objects.filter(
+            author__following__user=user, in_timelines=False
+        ).select_related('group', 'author')
+        super().__init__(pulled, per_page, **kwargs)
+
+    def _query(self, cursor, reverse=False, offset=0):
+        limit = offset + self.per_page + 1
+        entries = seek(
+            TimelineEntry.objects.filter(user=self.user).select_related(
+                'post__group', 'post__author'
+            ),
+            cursor, reverse, pk_field='post_id'
+        )
+        posts = [entry.post for entry in entries[:limit]]
+        posts += list(seek(self.object_list, cursor, reverse)[:limit])
+        posts.sort(
+            key=lambda post: (post.pub_date, post.pk), reverse=not reverse
+        )
+        return posts[offset:limit]
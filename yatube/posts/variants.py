@@ -0,0 +1,105 @@
+"""Адаптивные варианты картинок постов.
+
+После загрузки картинка в фоновом пуле уменьшается до нескольких ширин в
+JPEG и WebP. Список вариантов хранится в Post.image_variants (манифест в
+JSON), по нему тег {% responsive_image %} выводит <picture> со srcset:
+браузер сам выбирает подходящий размер и формат.
+"""
+import json
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from . import blobs, cache, thumbnails
+from .models import Post
+
+WIDTHS = (320, 640, 960, 1280)
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+UPLOAD_TO = 'posts/variants/'
+
+
+def _formats():
+    formats = [('jpeg', 'JPEG', JPEG_QUALITY)]
+    if features.check('webp'):
+        formats.append(('webp', 'WEBP', WEBP_QUALITY))
+    return formats
+
+
+def _widths(original_width):
+    widths = [width for width in WIDTHS if width < original_width]
+    return widths + [min(original_width, WIDTHS[-1])]
+
+
+def _flatten(image):
+    # JPEG не хранит прозрачность: подкладываем белый фон.
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def render(image):
+    """Нарезает варианты картинки и возвращает манифест."""
+    storage = image.storage
+    stem = os.path.splitext(os.path.basename(image.name))[0]
+    with image.open('rb'), Image.open(image) as source:
+        original = _flatten(ImageOps.exif_transpose(source))
+    manifest = {'width': original.width, 'height': original.height}
+    for width in _widths(original.width):
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.LANCZOS)
+        for name, image_format, quality in _formats():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, quality=quality)
+            path = storage.save(
+                f'{UPLOAD_TO}{stem}-{width}w.{name}',
+                ContentFile(buffer.getvalue())
+            )
+            manifest.setdefault(name, []).append([width, path])
+    return manifest
+
+
+def files(manifest):
+    """Имена файлов всех вариантов из манифеста."""
+    return [
+        path
+        for entries in manifest.values() if isinstance(entries, list)
+        for _, path in entries
+    ]
+
+
+def build(post_id):
+    """Строит манифест поста, если картинка за это время не сменилась."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author', 'group'
+    ).first()
+    if post is None or not post.image:
+        return None
+    manifest = render(post.image)
+    with transaction.atomic():
+        old = Post.objects.filter(
+            pk=post_id, image=post.image.name
+        ).values_list('image_variants', flat=True).first()
+        if old is None:
+            # Картинку уже сменили: файлы без ссылок уберёт collect_media.
+            return None
+        Post.objects.filter(pk=post_id).update(
+            image_variants=json.dumps(manifest)
+        )
+        for path in files(manifest):
+            blobs.acquire(path)
+        for path in files(json.loads(old) if old else {}):
+            blobs.release(path, post.image.storage)
+    cache.bump(*cache.post_scopes(post))
+    return manifest
+
+
+def enqueue(post):
+    """Ставит нарезку вариантов картинки поста в очередь после коммита."""
+    if post.image:
+        post_id = post.pk
+        transaction.on_commit(lambda: thumbnails.submit(build, post_id))
@@ -1,32 +1,106 @@
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 
+from core.sqlite import write
+
+from .cache import conditional_feed, feed_key, get_or_compute, mark_stale
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Follow, Group, Post
+from .paginator import CursorPaginator
+from .search import SearchPaginator
+from .timeline import TimelinePaginator
 
 NUMBER_OF_POSTS = 10
+NUMBER_OF_COMMENTS = 20
+
+
+def get_page(request, paginator):
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
 
 
 def paginator_of_page(request, posts):
-    paginator = Paginator(posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    return get_page(request, CursorPaginator(posts, NUMBER_OF_POSTS))
+
+
+def comments_of_page(request, post_id):
+    """Комментарии от старых к новым, по курсору ?after=."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).order_by('created', 'pk')
+    paginator = CursorPaginator(
+        comments, NUMBER_OF_COMMENTS, date_field='created', ascending=True
+    )
+    return paginator.get_page(after=request.GET.get('after'))
+
+
+def cached_feed(request, paginator, feed, *scopes):
+    """Страница ленты и её разметка, посчитанные одним воркером."""
+    def compute():
+        page_obj = get_page(request, paginator)
+        html = render_to_string(
+            'posts/includes/feed.html', {'page_obj': page_obj}, request
+        )
+        return paginator.page_state(page_obj), str(html)
+
+    key, version = feed_key(request, feed, *scopes)
+    state, html = get_or_compute(
+        key, version, compute, settings.FEED_CACHE_TIMEOUT,
+        stale=lambda: mark_stale(request)
+    )
+    return paginator.restore_page(state), mark_safe(html)
+
 
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    return ['posts', f'group:{group_id}']
 
+
+def profile_scopes(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    # Кнопка подписки зависит от подписок читателя.
+    return [f'profile:{author_id}', f'follow:{request.user.pk}']
+
+
+def post_scopes(request, post_id):
+    author_id, group_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first() or (None, None)
+    scopes = [f'post:{post_id}', f'profile:{author_id}']
+    # На странице поста видно название группы: её правка тоже меняет ETag.
+    if group_id is not None:
+        scopes.append(f'group:{group_id}')
+    return scopes
+
+
+@conditional_feed(lambda request: ['posts'])
 def index(request):
     posts = Post.objects.select_related('group', 'author')
-    page_obj = paginator_of_page(request, posts)
+    page_obj, feed = cached_feed(
+        request, CursorPaginator(posts, NUMBER_OF_POSTS), 'index', 'posts'
+    )
     context = {
         'page_obj': page_obj,
+        'feed': feed,
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_feed(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author')
     page_obj = paginator_of_page(request, posts)
     context = {
         'group': group,
@@ -35,10 +109,13 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_feed(profile_scopes)
 def profile(request, username):
     # Здесь код запроса к модели и создание словаря контекста
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.select_related('group')
     page_obj = paginator_of_page(request, posts)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author
@@ -51,25 +128,50 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_feed(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     comment_form = CommentForm(request.POST or None)
-    comment_post = post.comments.all()
     context = {
         'post': post,
         'comment_form': comment_form,
-        'comment_post': comment_post
+        'comment_page': comments_of_page(request, post.pk),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional_feed(post_scopes)
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    context = {
+        'post': post,
+        'comment_page': comments_of_page(request, post.pk),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = SearchPaginator(query, NUMBER_OF_POSTS).get_page(
+        after=request.GET.get('after')
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        write(post.save)
         return redirect('posts:profile', request.user)
     context = {
         'form': form,
@@ -106,16 +208,23 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@conditional_feed(
+    lambda request: ['posts', f'follow:{request.user.pk}']
+)
 def follow_index(request):
-    following = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_of_page(request, following)
+    follow = f'follow:{request.user.pk}'
+    page_obj, feed = cached_feed(
+        request, TimelinePaginator(request.user, NUMBER_OF_POSTS),
+        follow, 'posts', follow
+    )
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'feed': feed,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -126,7 +235,7 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if user != author:
-        Follow.objects.get_or_create(user=user, author=author)
+        write(Follow.objects.get_or_create, user=user, author=author)
     return redirect('posts:follow_index')
 
 
@@ -136,7 +245,7 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if user != author:
-        Follow.objects.filter(
+        write(Follow.objects.filter(
             user=request.user, author__username=username
-        ).delete()
+        ).delete)
     return redirect('posts:follow_index')
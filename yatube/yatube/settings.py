@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
   
 import os
+from importlib.util import find_spec
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -25,8 +27,19 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv("SECRET_KEY")
 
+# Профиль настроек задаёт SETTINGS_PROFILE: development (по умолчанию)
+# или production. В production нет DEBUG и debug_toolbar, шаблоны
+# компилируются один раз (cached loader), соединения с базой живут между
+# запросами, статика отдаётся из collectstatic с хешами в именах.
+SETTINGS_PROFILE = os.getenv('SETTINGS_PROFILE', 'development')
+if SETTINGS_PROFILE not in ('development', 'production'):
+    raise ImproperlyConfigured(
+        f'Неизвестный SETTINGS_PROFILE: {SETTINGS_PROFILE}'
+    )
+PRODUCTION = SETTINGS_PROFILE == 'production'
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', '0' if PRODUCTION else '1') == '1'
 
 ALLOWED_HOSTS = []
 
@@ -44,20 +57,26 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.telemetry.TelemetryMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.queries.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar нужен только при разработке и ставится отдельно.
+if DEBUG and find_spec('debug_toolbar'):
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -66,7 +85,7 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.telemetry.TimedTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,6 +100,16 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    # Шаблоны читаются с диска и разбираются один раз на процесс.
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -90,10 +119,54 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Другая база, например для бенчмарков: DB_NAME=benchmark.sqlite3.
+        'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        # Секунды жизни соединения между запросами; 0 — на каждый запрос
+        # новое.
+        'CONN_MAX_AGE': int(
+            os.getenv('CONN_MAX_AGE', 60 if PRODUCTION else 0)
+        ),
     }
 }
 
+# Реплики для чтения лент (core.routers): DB_REPLICAS — пути к файлам
+# реплик через запятую, у каждой свой алиас replica1, replica2... Запросы
+# к REPLICA_VIEWS читают с реплик; записавший клиент ещё
+# REPLICA_STICKY_SECONDS секунд читает из основной базы. Для локальной
+# проверки REPLICA_REPLAY=1 повторяет записи основной базы на файлах
+# реплик (core.replicas), начальную копию делает команда sync_replicas.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    DATABASE_REPLICAS.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], NAME=name, TEST={'MIRROR': 'default'}
+    )
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_VIEWS = [
+    'posts:index', 'posts:group_posts', 'posts:profile', 'posts:post_detail',
+    'api_v1:posts', 'api_v1:group', 'api_v1:profile', 'api_v1:post',
+]
+REPLICA_STICKY_SECONDS = 5
+REPLICA_REPLAY = os.getenv('REPLICA_REPLAY', '') == '1'
+
+# Прагмы каждого соединения с SQLite (core.sqlite): WAL, чтобы чтение не
+# ждало записи; NORMAL в WAL теряет при сбое питания только последние
+# транзакции, но не портит базу; mmap и кеш страниц (в КиБ, если < 0)
+# убирают лишние чтения с диска; busy_timeout — сколько мс ждать чужую
+# запись, он идёт первым: смена журнала сама может ждать блокировку.
+# Записи из представлений повторяются при «database is locked».
+SQLITE_PRAGMAS = {
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+SQLITE_WRITE_RETRIES = 5
+SQLITE_RETRY_DELAY = 0.05
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -130,6 +203,15 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.getenv(
+    'STATIC_ROOT', os.path.join(BASE_DIR, 'collected_static')
+)
+
+if PRODUCTION:
+    # Имена с хешем содержимого можно кешировать у клиентов навсегда.
+    STATICFILES_STORAGE = (
+        'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+    )
 
 LOGIN_URL = 'users:login'
 
@@ -146,16 +228,133 @@ ALLOWED_HOSTS = [
 ]
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+# Бэкенд кеша выбирается переменной окружения CACHE_BACKEND. locmem живёт
+# внутри процесса, file и sqlite общие для всех воркеров на машине и не
+# требуют внешнего сервиса, redis (нужен django-redis) и memcached
+# (нужен python-memcached) подходят для нескольких машин. В production по
+# умолчанию sqlite: версии лент в locmem не доходили бы до других воркеров,
+# и они часами отдавали бы устаревшие фрагменты.
+CACHE_BACKENDS = {
+    'locmem': (
+        'django.core.cache.backends.locmem.LocMemCache', ''
+    ),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+    ),
+    'sqlite': (
+        'core.cache.SQLiteCache',
+        os.path.join(BASE_DIR, 'cache.sqlite3'),
+    ),
+    'redis': (
+        'django_redis.cache.RedisCache', 'redis://127.0.0.1:6379/1'
+    ),
+    'memcached': (
+        'django.core.cache.backends.memcached.MemcachedCache',
+        '127.0.0.1:11211',
+    ),
+}
+
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'sqlite' if PRODUCTION else 'locmem'
+)
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Обёртка замеряет время обращений к кешу для Server-Timing.
+        'BACKEND': 'core.telemetry.TimedCache',
+        'WRAPPED_BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]
+        ),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', 300)),
     }
 }
 
+if CACHE_BACKEND in ('locmem', 'file', 'sqlite'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+    }
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ] 
+
+# Авторы с большим числом подписчиков не рассылаются по лентам при
+# публикации: их посты подмешиваются в ленту при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Фрагменты лент сбрасываются версиями при изменениях, поэтому их
+# можно держать в кеше долго.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Метка выкладки входит в ETag страниц: после выкладки с новыми шаблонами
+# сохранённые у клиентов копии перестают совпадать.
+RELEASE = os.getenv('RELEASE', '')
+
+# Миниатюры нарезаются в фоновом пуле, запрос получает заглушку, пока
+# миниатюра не готова. При THUMBNAIL_WORKERS = 0 картинки обрабатываются
+# сразу после коммита в том же потоке: так удобнее при разработке.
+THUMBNAIL_BACKEND = 'posts.thumbnails.QueuedThumbnailBackend'
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 0 if DEBUG else 2))
+
+# Бюджеты SQL-запросов представлений вместе с сессией и пользователем
+# (core.queries). При DEBUG превышение пишется в лог, в строгом режиме
+# (QUERY_BUDGET_STRICT=1, например в CI) запрос падает с ошибкой.
+QUERY_BUDGET_DEFAULT = 5
+QUERY_BUDGETS = {
+    'posts:index': 3,
+    'posts:group_posts': 5,
+    'posts:profile': 6,
+    'posts:post_detail': 5,
+    'posts:post_comments': 5,
+    'posts:search': 5,
+    'posts:post_create': 3,
+    'posts:post_edit': 5,
+    'posts:add_comment': 3,
+    'posts:follow_index': 4,
+    'posts:profile_follow': 6,
+    'posts:profile_unfollow': 10,
+    'api_v1:posts': 3,
+    'api_v1:post': 5,
+    'api_v1:comments': 5,
+    'api_v1:group': 5,
+    'api_v1:profile': 6,
+    'api_v1:follow': 6,
+}
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', '') == '1'
+
+# Замеры запросов (core.telemetry): заголовок Server-Timing и журнал
+# JSON lines в файле TELEMETRY_LOG, если он задан. Раз в
+# TELEMETRY_SUMMARY_EVERY запросов в журнал пишутся перцентили
+# длительности по представлениям за последние TELEMETRY_WINDOW запросов.
+SERVER_TIMING = os.getenv('SERVER_TIMING', '1') == '1'
+TELEMETRY_LOG = os.getenv('TELEMETRY_LOG', '')
+TELEMETRY_WINDOW = 1000
+TELEMETRY_SUMMARY_EVERY = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {},
+    'loggers': {},
+}
+
+if TELEMETRY_LOG:
+    LOGGING['handlers']['telemetry'] = {
+        'class': 'logging.FileHandler',
+        'filename': TELEMETRY_LOG,
+        'formatter': 'message',
+    }
+    LOGGING['loggers']['core.telemetry'] = {
+        'handlers': ['telemetry'],
+        'level': 'INFO',
+        'propagate': False,
+    }